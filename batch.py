@@ -0,0 +1,217 @@
+"""구독자 프로필 파일로 추천을 미리 일괄 생성합니다.
+
+프로필은 JSONL 또는 CSV(.csv)로 받습니다. 항목 이름은 사이드바와 같습니다.
+(id, sido, gungu, date(YYYY-MM-DD), gender, age, height, weight, style_preference, tpo, personal_color, request)
+sido 대신 lat/lon을 주면 가장 가까운 구/군으로 바꿉니다. 빠진 항목은 사이드바 기본값을 씁니다.
+
+같은 격자의 예보는 한 번만 조회합니다. 결과는 끝나는 대로 출력 파일(JSONL)에 한 줄씩 추가됩니다.
+같은 출력 파일로 다시 실행하면 이미 성공한 id는 건너뛰고 이어서 생성합니다.
+
+    OPENAI_API_KEY=... KMA_SERVICE_KEY=... python batch.py profiles.jsonl -o recommendations.jsonl --concurrency 16
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+
+from llm_gateway import DEFAULT_MODEL, LLMGateway
+from locations import location_registry
+from recommender import DEFAULT_USER_INFO, generate_recommendation, is_weather_error, new_user_info, resolve_location
+from weather import get_forecast_summary
+
+# 프로필에 request가 없을 때 쓰는 요청 (앱의 첫 번째 추천 버튼과 같음)
+DEFAULT_REQUEST = "패션 추천받기 👕"
+
+
+# --- 입력 ---
+def read_profiles(path):
+    """JSONL 또는 CSV 파일에서 프로필을 차례로 읽습니다. id가 없으면 줄 번호를 씁니다."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for i, row in enumerate(rows, 1):
+            profile = {k: v for k, v in row.items() if v not in (None, "")}
+            profile["id"] = str(profile.get("id", i))
+            yield profile
+
+
+def fill_locations_from_coordinates(profiles):
+    """sido 없이 lat/lon만 있는 프로필에 가장 가까운 시/도·구/군을 한 번에 채웁니다."""
+    pending = [p for p in profiles if "sido" not in p and "lat" in p and "lon" in p]
+    if not pending:
+        return
+    names = location_registry.nearest_districts([float(p["lat"]) for p in pending], [float(p["lon"]) for p in pending])
+    for profile, (sido, gungu) in zip(pending, names):
+        profile["sido"], profile["gungu"] = sido, gungu
+
+
+def to_user_info(profile):
+    """프로필 한 줄을 recommender가 쓰는 사용자 정보 dict로 바꿉니다. 알 수 없는 지역이면 KeyError."""
+    overrides = {k: str(profile[k]) for k in DEFAULT_USER_INFO if k in profile}
+    if "date" in profile:
+        overrides["date"] = date.fromisoformat(str(profile["date"]))
+    user_info = new_user_info(**overrides)
+    resolve_location(user_info)
+    return user_info
+
+
+def group_by_cell(jobs):
+    """(profile, user_info) 목록을 격자 → 날짜 → 작업 목록으로 묶습니다."""
+    groups = {}
+    for profile, user_info in jobs:
+        coords, _ = resolve_location(user_info)
+        by_date = groups.setdefault((coords["nx"], coords["ny"]), {})
+        by_date.setdefault(user_info["date"], []).append((profile, user_info))
+    return groups
+
+
+# --- 이어서 실행 ---
+def load_finished(path):
+    """이전 실행에서 성공한 프로필 id 집합. 중단으로 잘린 마지막 줄은 잘라 내고 이어 씁니다."""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "rb+") as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "recommendation" in record:
+                finished.add(record["id"])
+        f.truncate(complete)
+    return finished
+
+
+# --- 실행 ---
+def fetch_weather(cells, service_key, max_workers):
+    """격자마다 예보를 한 번씩 받아 (nx, ny) → ForecastSummary 또는 예외 dict를 만듭니다."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-weather") as pool:
+        futures = {pool.submit(get_forecast_summary, nx, ny, service_key): (nx, ny) for nx, ny in cells}
+        for future, cell in futures.items():
+            try:
+                results[cell] = future.result()
+            except Exception as e:
+                results[cell] = e
+    return results
+
+
+def weather_text(summary, target_date):
+    if isinstance(summary, Exception):
+        return f"오류: 날씨 정보를 가져오지 못했습니다. ({summary})"
+    weather_info = summary.format(target_date.strftime("%Y%m%d"))
+    if weather_info is None:
+        return f"오류: {target_date.strftime('%Y년 %m월 %d일')}의 예보가 아직 없습니다."
+    return weather_info
+
+
+def run_batch(profiles_path, output_path, openai_api_key, kma_service_key, concurrency=8,
+              weather_workers=4, model=DEFAULT_MODEL, gateway=None, log=sys.stderr):
+    """프로필 파일의 추천을 생성해 output_path에 이어 씁니다. 실행 통계를 반환합니다."""
+    started = time.monotonic()
+    gateway = gateway or LLMGateway(max_inflight=concurrency)
+    finished = load_finished(output_path)
+    stats = {"profiles": 0, "skipped": 0, "invalid": 0, "cells": 0, "ok": 0, "failed": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        profiles = list(read_profiles(profiles_path))
+        stats["profiles"] = len(profiles)
+        profiles = [p for p in profiles if p["id"] not in finished]
+        stats["skipped"] = stats["profiles"] - len(profiles)
+        fill_locations_from_coordinates(profiles)
+
+        jobs = []
+        for profile in profiles:
+            try:
+                jobs.append((profile, to_user_info(profile)))
+            except (KeyError, ValueError) as e:
+                stats["invalid"] += 1
+                write({"id": profile["id"], "error": f"잘못된 프로필: {e}"})
+
+        groups = group_by_cell(jobs)
+        stats["cells"] = len(groups)
+        print(f"{len(jobs)}명 / 격자 {len(groups)}개 (건너뜀 {stats['skipped']}명)", file=log)
+        summaries = fetch_weather(groups, kma_service_key, weather_workers)
+
+        def recommend(profile, user_info, weather_info):
+            return generate_recommendation(openai_api_key, user_info, weather_info,
+                                           profile.get("request", DEFAULT_REQUEST), cacheable=True,
+                                           model=model, gateway=gateway)
+
+        def collect(done):
+            for future in done:
+                profile, user_info = pending.pop(future)
+                record = {"id": profile["id"], "sido": user_info["sido"], "gungu": user_info["gungu"],
+                          "date": user_info["date"].isoformat()}
+                try:
+                    record["recommendation"] = future.result()
+                    stats["ok"] += 1
+                except Exception as e:
+                    record["error"] = str(e)
+                    stats["failed"] += 1
+                write(record)
+
+        pending = {}  # future -> (profile, user_info)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-llm") as pool:
+            try:
+                for cell, by_date in groups.items():
+                    for target_date, group in by_date.items():
+                        weather_info = weather_text(summaries[cell], target_date)
+                        for profile, user_info in group:
+                            if is_weather_error(weather_info):
+                                stats["failed"] += 1
+                                write({"id": profile["id"], "error": weather_info})
+                                continue
+                            # 대기 중인 작업이 쌓이지 않도록 동시 실행 수의 두 배까지만 넣어 둡니다.
+                            while len(pending) >= concurrency * 2:
+                                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                                collect(done)
+                            pending[pool.submit(recommend, profile, user_info, weather_info)] = (profile, user_info)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            except KeyboardInterrupt:
+                # 이미 쓴 결과는 남아 있으므로, 같은 명령으로 다시 실행하면 이어서 진행합니다.
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    stats["duration_sec"] = round(time.monotonic() - started, 3)
+    stats.update({k: v for k, v in gateway.stats().items() if k in ("upstream_calls", "coalesced", "cache_hits")})
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profiles", help="프로필 파일 (.jsonl 또는 .csv)")
+    parser.add_argument("-o", "--output", required=True, help="결과 JSONL 파일 (있으면 이어서 작성)")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 진행할 LLM 호출 수")
+    parser.add_argument("--weather-workers", type=int, default=4, help="동시에 조회할 격자 수")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--openai-api-key", default=os.environ.get("OPENAI_API_KEY"))
+    parser.add_argument("--kma-service-key", default=os.environ.get("KMA_SERVICE_KEY"))
+    args = parser.parse_args()
+    if not args.openai_api_key or not args.kma_service_key:
+        parser.error("OpenAI API 키와 기상청 서비스 키가 필요합니다. (--openai-api-key/--kma-service-key 또는 환경 변수)")
+
+    stats = run_batch(args.profiles, args.output, args.openai_api_key, args.kma_service_key,
+                      concurrency=args.concurrency, weather_workers=args.weather_workers, model=args.model)
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""벤치마크용 기상청 단기예보(getVilageFcst) 응답 픽스처."""
+import json
+from datetime import datetime, timedelta
+
+# 시간대별 예보 카테고리 (실제 응답과 같은 12종)
+HOURLY_CATEGORIES = ["TMP", "UUU", "VVV", "VEC", "WSD", "SKY", "PTY", "POP", "WAV", "PCP", "REH", "SNO"]
+
+
+def make_forecast_items(nx=60, ny=127, base_dt=None, days=4):
+    """발표 시각부터 days일치의 시간대별 예보 항목을 만듭니다. (일 최저/최고 기온 포함)"""
+    base_dt = base_dt or datetime.now().replace(minute=0, second=0, microsecond=0)
+    base_date, base_time = base_dt.strftime("%Y%m%d"), base_dt.strftime("%H%M")
+    items = []
+    slot = base_dt + timedelta(hours=1)
+    end = (base_dt + timedelta(days=days)).replace(hour=0)
+    while slot < end:
+        fcst_date, fcst_time = slot.strftime("%Y%m%d"), slot.strftime("%H%M")
+        values = {
+            "TMP": str(8 + (slot.hour * 7) % 12), "UUU": "1.2", "VVV": "-0.8", "VEC": "250", "WSD": "2.1",
+            "SKY": "1" if slot.day % 3 == 0 else ("3" if slot.hour < 12 else "4"),
+            "PTY": "1" if slot.day % 4 == 0 and slot.hour in (15, 16) else "0",
+            "POP": "60" if slot.day % 4 == 0 else "10", "WAV": "0",
+            "PCP": "강수없음", "REH": "55", "SNO": "적설없음",
+        }
+        for category in HOURLY_CATEGORIES:
+            items.append(_item(base_date, base_time, category, fcst_date, fcst_time, values[category], nx, ny))
+        if slot.hour == 6:
+            items.append(_item(base_date, base_time, "TMN", fcst_date, fcst_time, "6.0", nx, ny))
+        if slot.hour == 15:
+            items.append(_item(base_date, base_time, "TMX", fcst_date, fcst_time, "18.0", nx, ny))
+        slot += timedelta(hours=1)
+    return items
+
+
+def _item(base_date, base_time, category, fcst_date, fcst_time, value, nx, ny):
+    return {"baseDate": base_date, "baseTime": base_time, "category": category,
+            "fcstDate": fcst_date, "fcstTime": fcst_time, "fcstValue": value, "nx": nx, "ny": ny}
+
+
+def forecast_page(items, page_no=1, num_of_rows=1000, result_code="00", result_msg="NORMAL_SERVICE"):
+    """items 중 한 페이지를 실제 API와 같은 JSON 응답 본문(bytes)으로 만듭니다."""
+    start = (page_no - 1) * num_of_rows
+    body = {
+        "response": {
+            "header": {"resultCode": result_code, "resultMsg": result_msg},
+            "body": {
+                "dataType": "JSON",
+                "items": {"item": items[start:start + num_of_rows]},
+                "pageNo": page_no, "numOfRows": num_of_rows, "totalCount": len(items),
+            },
+        }
+    }
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,254 @@
+"""사이드바 조작/채팅 한 번마다 스크립트가 몇 번, 얼마나 오래 실행되는지 측정합니다.
+
+Streamlit AppTest로 앱을 브라우저 없이 실행하고, 기상청/OpenAI 호출은 가짜 응답으로 대체합니다.
+프래그먼트 안의 위젯을 조작하면 실제 브라우저처럼 해당 프래그먼트만 다시 실행되도록 요청합니다.
+
+    python bench/measure_reruns.py                     # 현재 streamlit_app.py
+    git show <commit>:streamlit_app.py > /tmp/old_app.py
+    python bench/measure_reruns.py --script /tmp/old_app.py   # 이전 버전과 비교
+    python bench/measure_reruns.py --turns 60 --repeat 1     # 대화가 길어질 때 턴당 비용
+"""
+import argparse
+import dataclasses
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import openai
+import requests
+from openai.types.chat import ChatCompletionChunk
+from streamlit.logger import set_log_level
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from fixtures import forecast_page, make_forecast_items
+
+ANSWER_WORDS = ("오늘은 가벼운 니트와 슬랙스를 추천드려요. " * 40).split(" ")
+
+
+# --- 가짜 upstream ---
+class FakeKmaResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self._body = body
+        self.raw = io.BytesIO(body)
+
+    def json(self):
+        return json.loads(self._body)
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fake_session_request(self, method, url, params=None, **kwargs):
+    params = params or {}
+    items = make_forecast_items(int(params.get("nx", 60)), int(params.get("ny", 127)))
+    return FakeKmaResponse(forecast_page(items, int(params.get("pageNo", 1)), int(params.get("numOfRows", 1000))))
+
+
+class FakeOpenAI:
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, stream=False, **kwargs):
+        for word in ANSWER_WORDS:
+            yield ChatCompletionChunk(
+                id="bench", created=0, model=model, object="chat.completion.chunk",
+                choices=[{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            )
+
+    def close(self):
+        pass
+
+
+# --- 실행 횟수 계측 ---
+class RunRecorder:
+    """LocalScriptRunner가 보내는 SCRIPT_STARTED 이벤트로 전체/프래그먼트 실행 횟수를 셉니다."""
+
+    def __init__(self):
+        self.full_runs = 0
+        self.fragment_runs = 0
+        self.fragment_for_widget = {}  # widget id -> fragment id
+        self.next_fragment_id = None
+        self._original_run = LocalScriptRunner.run
+
+    def install(self):
+        recorder = self
+
+        def run(runner, widget_state=None, query_params=None, timeout=3, page_hash=""):
+            def on_event(sender, event, **kwargs):
+                if event == ScriptRunnerEvent.SCRIPT_STARTED:
+                    if kwargs.get("fragment_ids_this_run"):
+                        recorder.fragment_runs += 1
+                    else:
+                        recorder.full_runs += 1
+            runner.on_event.connect(on_event, weak=False)
+
+            fragment_id, recorder.next_fragment_id = recorder.next_fragment_id, None
+            if fragment_id is not None:
+                # AppTest는 전체 실행용 초기 요청을 미리 넣어 두므로, 그 요청도 프래그먼트 실행으로 바꿉니다.
+                runner._requests._rerun_data = dataclasses.replace(
+                    runner._requests._rerun_data, fragment_id_queue=[fragment_id])
+                original_request_rerun = runner.request_rerun
+                runner.request_rerun = lambda data: original_request_rerun(
+                    dataclasses.replace(data, fragment_id_queue=[fragment_id]))
+
+            tree = recorder._original_run(runner, widget_state, query_params, timeout, page_hash)
+            if fragment_id is None:
+                recorder._index_fragments(runner.forward_msgs())
+            return tree
+
+        LocalScriptRunner.run = run
+
+    def _index_fragments(self, msgs):
+        for msg in msgs:
+            if not msg.HasField("delta") or not msg.delta.fragment_id:
+                continue
+            element = msg.delta.new_element
+            kind = element.WhichOneof("type")
+            widget_id = getattr(getattr(element, kind), "id", None) if kind else None
+            if widget_id:
+                self.fragment_for_widget[widget_id] = msg.delta.fragment_id
+
+
+def measure(at, recorder, name, widget=None, action=None):
+    """위젯을 조작하고 그 결과로 실행된 스크립트 횟수와 시간을 기록합니다."""
+    if action is not None:
+        action()
+    fragment_id = recorder.fragment_for_widget.get(widget.id) if widget is not None else None
+    widget_state = at._tree.get_widget_states()
+
+    recorder.full_runs = recorder.fragment_runs = 0
+    recorder.next_fragment_id = fragment_id
+    started = time.perf_counter()
+    at._run(widget_state)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    result = {"interaction": name, "full_runs": recorder.full_runs,
+              "fragment_runs": recorder.fragment_runs, "wall_ms": round(elapsed_ms, 1)}
+
+    if fragment_id is not None:
+        # AppTest는 실행마다 요소 트리를 새로 만들므로, 다음 조작을 위해 (측정 밖에서) 전체 트리를 다시 받습니다.
+        at._run(widget_state)
+    return result
+
+
+def reset_process_caches():
+    """반복 실행 간에 프로세스 전역 캐시가 이어지지 않도록 비웁니다. (rerun 비용만 비교하기 위함)"""
+    if "weather" in sys.modules:
+        sys.modules["weather"].forecast_cache.clear()
+    if "llm_gateway" in sys.modules:
+        from completion_cache import CompletionCache
+        sys.modules["llm_gateway"].llm_gateway.cache = CompletionCache()
+
+
+def run_scenario(script, recorder):
+    reset_process_caches()
+    at = AppTest.from_file(script, default_timeout=30)
+
+    results = [measure(at, recorder, "첫 로드")]
+
+    def sidebar_text(label):
+        return next(w for w in at.sidebar.text_input if w.label == label)
+
+    def sidebar_select(label):
+        return next(w for w in at.sidebar.selectbox if w.label == label)
+
+    sidebar_text("OpenAI API Key").set_value("sk-bench")
+    key_input = sidebar_text("기상청 API 서비스 키")
+    results.append(measure(at, recorder, "API 키 입력", key_input, lambda: key_input.set_value("kma-bench")))
+
+    date_input = at.sidebar.date_input[0]
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    results.append(measure(at, recorder, "날짜 변경", date_input, lambda: date_input.set_value(tomorrow)))
+
+    sido = sidebar_select("시/도")
+    results.append(measure(at, recorder, "시/도 변경", sido, lambda: sido.set_value("부산광역시")))
+
+    gungu = sidebar_select("구/군")
+    results.append(measure(at, recorder, "구/군 변경", gungu, lambda: gungu.set_value("해운대구")))
+
+    gender = at.sidebar.radio[0]
+    results.append(measure(at, recorder, "성별 변경", gender, lambda: gender.set_value("남성")))
+
+    for i in range(3):
+        button = at.button(key=f"action_btn_{i}")
+        results.append(measure(at, recorder, f"추천 버튼 {i + 1}", button, button.click))
+
+    age = sidebar_select("나이")
+    results.append(measure(at, recorder, "나이 변경 (대화 3회 후)", age, lambda: age.set_value("30대")))
+    return results
+
+
+def run_long_conversation(script, recorder, turns, every=10):
+    """추천 버튼으로 대화를 turns번 이어가며, every번마다 한 턴의 실행 시간을 기록합니다."""
+    reset_process_caches()
+    at = AppTest.from_file(script, default_timeout=30)
+    at.run()
+    next(w for w in at.sidebar.text_input if w.label == "OpenAI API Key").set_value("sk-bench")
+    next(w for w in at.sidebar.text_input if w.label == "기상청 API 서비스 키").set_value("kma-bench")
+    at.run()
+
+    results = []
+    for turn in range(1, turns + 1):
+        button = at.button(key="action_btn_0")
+        result = measure(at, recorder, f"대화 {turn}턴째", button, button.click)
+        if turn % every == 0:
+            result["chat_messages"] = len(at.chat_message)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=os.path.join(ROOT, "streamlit_app.py"))
+    parser.add_argument("--repeat", type=int, default=5, help="시나리오 반복 횟수 (wall_ms는 중앙값)")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    parser.add_argument("--turns", type=int, default=0, help="0보다 크면 긴 대화 시나리오를 대신 실행 (턴 수)")
+    args = parser.parse_args()
+
+    set_log_level("error")
+    requests.Session.request = fake_session_request
+    openai.OpenAI = FakeOpenAI
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    recorder = RunRecorder()
+    recorder.install()
+
+    # 같은 시나리오를 새 세션으로 여러 번 실행해 상호작용별 중앙값을 냅니다.
+    if args.turns:
+        rounds = [run_long_conversation(args.script, recorder, args.turns) for _ in range(args.repeat)]
+    else:
+        rounds = [run_scenario(args.script, recorder) for _ in range(args.repeat)]
+    results = []
+    for samples in zip(*rounds):
+        result = dict(samples[0])
+        result["wall_ms"] = round(statistics.median(r["wall_ms"] for r in samples), 1)
+        results.append(result)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'interaction':<24}{'full':>6}{'fragment':>10}{'wall_ms':>10}{'chat_msgs':>11}")
+    for r in results:
+        print(f"{r['interaction']:<24}{r['full_runs']:>6}{r['fragment_runs']:>10}{r['wall_ms']:>10}{r.get('chat_messages', ''):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""실제 API 키/인터넷 없이 날씨 조회와 채팅 한 턴의 성능을 측정합니다.
+
+로컬 대역 서버(stub_servers.py)를 띄우고 여러 세션을 동시에 흉내 내어,
+처리량, 지연 시간 p50/p95/p99, 첫 토큰까지의 시간(TTFT, 턴 시작부터), upstream 호출 수를 JSON으로 냅니다.
+
+- weather: 세션마다 임의의 구/군·날짜로 get_kma_weather_forecast 호출
+- chat: 날씨 조회 → 프롬프트 작성 → LLM 스트리밍까지 앱의 채팅 한 턴 (화면 렌더링 제외)
+
+    python bench/run_benchmark.py --sessions 20 --turns 5 -o before.json
+    python bench/run_benchmark.py --sessions 20 --turns 5 -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from stub_servers import KmaStubServer, OpenAIStubServer
+
+import weather
+from completion_cache import CompletionCache
+from llm_gateway import LLMGateway
+from locations import location_registry
+from recommender import is_weather_error, lookup_weather, new_user_info, stream_recommendation
+
+BUTTON_REQUESTS = ["패션 추천받기 👕", "데이트룩 추천 💖", "소개팅룩 추천해줘 ✨"]
+
+
+# --- 통계 ---
+def latency_summary(samples):
+    """초 단위 표본을 ms 단위 p50/p95/p99/평균/최대로 요약합니다. (nearest-rank)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(-(-p * len(ordered) // 100)) - 1))] * 1000, 1)
+
+    return {"count": len(ordered), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def run_sessions(sessions, turns, turn):
+    """sessions개의 스레드가 각각 turns번 turn(rng)을 실행합니다. (총 소요 시간, 결과 목록) 반환."""
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(sessions + 1)
+
+    def session(seed):
+        rng = random.Random(seed)
+        start.wait()
+        for _ in range(turns):
+            result = turn(rng)
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    start.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, results
+
+
+def random_user_info(rng):
+    sido = rng.choice(location_registry.sido_names)
+    gungu = rng.choice(location_registry.gungu_options(sido))
+    return new_user_info(
+        sido=sido, gungu=gungu, date=datetime.now().date() + timedelta(days=rng.randint(0, 2)),
+        gender=rng.choice(["여성", "남성"]), age=rng.choice(["20대", "30대", "40대"]),
+    )
+
+
+def reset_process_caches():
+    weather.forecast_cache.clear()
+
+
+# --- 시나리오 ---
+def weather_scenario(args, kma):
+    reset_process_caches()
+    kma.reset_counters()
+
+    def turn(rng):
+        user_info = random_user_info(rng)
+        started = time.perf_counter()
+        weather_info = lookup_weather(user_info, "bench-key")
+        return time.perf_counter() - started, is_weather_error(weather_info)
+
+    duration, results = run_sessions(args.sessions, args.turns, turn)
+    return {
+        "operations": len(results), "duration_sec": round(duration, 3),
+        "throughput_per_sec": round(len(results) / duration, 2),
+        "errors": sum(1 for _, error in results if error),
+        "latency": latency_summary([elapsed for elapsed, _ in results]),
+        "upstream": {"kma": kma.snapshot()},
+        "forecast_cache": {"hits": weather.forecast_cache.hits, "misses": weather.forecast_cache.misses},
+    }
+
+
+def chat_scenario(args, kma, llm):
+    reset_process_caches()
+    kma.reset_counters()
+    llm.reset_counters()
+    gateway = LLMGateway(max_inflight=args.max_inflight, cache=CompletionCache())
+
+    def turn(rng):
+        user_info = random_user_info(rng)
+        # 추천 버튼(캐시 대상)과 직접 입력한 질문을 섞습니다.
+        cacheable = rng.random() < args.button_ratio
+        request = rng.choice(BUTTON_REQUESTS) if cacheable else f"출근룩 추천해줘 #{rng.getrandbits(32)}"
+        started = time.perf_counter()
+        weather_info = lookup_weather(user_info, "bench-key")
+        if is_weather_error(weather_info):
+            return {"error": weather_info}
+        first_token = None
+        try:
+            for _ in stream_recommendation("sk-bench", user_info, weather_info, request, cacheable=cacheable, gateway=gateway):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+        except Exception as e:
+            return {"error": str(e)}
+        return {"latency": time.perf_counter() - started, "ttft": first_token}
+
+    duration, results = run_sessions(args.sessions, args.turns, turn)
+    ok = [r for r in results if "error" not in r]
+    return {
+        "operations": len(results), "duration_sec": round(duration, 3),
+        "throughput_per_sec": round(len(results) / duration, 2),
+        "errors": len(results) - len(ok),
+        "latency": latency_summary([r["latency"] for r in ok]),
+        "ttft": latency_summary([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "upstream": {"kma": kma.snapshot(), "openai": llm.snapshot()},
+        "gateway": gateway.stats(),
+    }
+
+
+# --- 비교 ---
+def compare(before, after):
+    """두 결과의 주요 지표를 (이전, 이후, 변화율%) 표로 출력합니다."""
+    print(f"{'metric':<36}{'before':>12}{'after':>12}{'change':>10}")
+    for name, scenario in after["scenarios"].items():
+        previous = before.get("scenarios", {}).get(name, {})
+        rows = [("throughput_per_sec", scenario.get("throughput_per_sec"), previous.get("throughput_per_sec"))]
+        for section in ("latency", "ttft"):
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if key in scenario.get(section, {}):
+                    rows.append((f"{section}.{key}", scenario[section][key], previous.get(section, {}).get(key)))
+        for upstream, counters in scenario.get("upstream", {}).items():
+            rows.append((f"upstream.{upstream}.requests", counters.get("requests", 0),
+                         previous.get("upstream", {}).get(upstream, {}).get("requests", 0)))
+        for metric, new, old in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+            print(f"{name + '.' + metric:<36}{str(old):>12}{str(new):>12}{change:>10}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["weather", "chat", "all"], default="all")
+    parser.add_argument("--sessions", type=int, default=20, help="동시 세션 수")
+    parser.add_argument("--turns", type=int, default=5, help="세션당 반복 횟수")
+    parser.add_argument("--button-ratio", type=float, default=0.5, help="chat에서 추천 버튼(캐시 대상) 요청 비율")
+    parser.add_argument("--max-inflight", type=int, default=16, help="게이트웨이 동시 스트림 수")
+    parser.add_argument("--kma-latency-ms", type=float, default=80.0)
+    parser.add_argument("--kma-error-rate", type=float, default=0.0)
+    parser.add_argument("--kma-days", type=int, default=4, help="생성 픽스처의 예보 일수 (페이지 수 조절)")
+    parser.add_argument("--kma-fixture", help="저장해 둔 getVilageFcst 응답(JSON) 파일")
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="결과 JSON 파일 (없으면 표준 출력)")
+    parser.add_argument("--compare", help="이전 결과 JSON과 비교해 변화율을 출력")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    kma = KmaStubServer(latency_ms=args.kma_latency_ms, error_rate=args.kma_error_rate,
+                        days=args.kma_days, fixture_path=args.kma_fixture)
+    llm = OpenAIStubServer(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec,
+                           answer_tokens=args.answer_tokens, error_rate=args.openai_error_rate)
+    with kma, llm:
+        # 모듈은 이미 import되었으므로 URL은 모듈 값을 직접 바꾸고, OpenAI 클라이언트는 환경 변수로 대역 서버를 가리킵니다.
+        weather.KMA_FORECAST_URL = kma.url
+        os.environ["OPENAI_BASE_URL"] = llm.url
+
+        scenarios = {}
+        if args.scenario in ("weather", "all"):
+            scenarios["weather"] = weather_scenario(args, kma)
+        if args.scenario in ("chat", "all"):
+            scenarios["chat"] = chat_scenario(args, kma, llm)
+
+    result = {
+        "revision": git_revision(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "scenarios": scenarios,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
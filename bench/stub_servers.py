@@ -0,0 +1,257 @@
+"""벤치마크용 로컬 대역 서버: 기상청 getVilageFcst와 OpenAI 호환 스트리밍 API.
+
+지연 시간, 오류 비율, 첫 토큰까지의 시간(TTFT), 토큰 속도를 조절할 수 있고, 받은 요청 수를 셉니다.
+단독으로 띄워 실제 앱을 붙여 볼 수도 있습니다.
+
+    python bench/stub_servers.py --kma-port 8001 --openai-port 8002
+    KMA_FORECAST_URL=http://127.0.0.1:8001/1360000/VilageFcstInfoService_2.0/getVilageFcst \\
+    OPENAI_BASE_URL=http://127.0.0.1:8002/v1 streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fixtures import forecast_page, make_forecast_items
+
+KMA_FORECAST_PATH = "/1360000/VilageFcstInfoService_2.0/getVilageFcst"
+DEFAULT_ANSWER = "오늘은 가벼운 니트에 슬랙스, 로퍼를 매치해 보세요. 일교차가 크니 얇은 트렌치코트를 걸치면 좋아요."
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (클라이언트 연결 풀 재사용)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json;charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 클라이언트가 keep-alive 연결을 먼저 끊는 것은 정상 동작이므로 로그를 남기지 않습니다.
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """백그라운드 스레드에서 도는 HTTP 서버. 요청/오류 수를 셉니다."""
+
+    handler_class = _Handler
+
+    def __init__(self, host="127.0.0.1", port=0):
+        handler = type("Handler", (self.handler_class,), {"stub": self})
+        self.httpd = _QuietHTTPServer((host, port), handler)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset_counters(self):
+        with self._lock:
+            self.counters = {}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- 기상청 ---
+class _KmaHandler(_Handler):
+    def do_GET(self):
+        stub = self.stub
+        url = urlparse(self.path)
+        if url.path != KMA_FORECAST_PATH:
+            self._send(404, b"{}")
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        stub.count("requests")
+        stub.delay()
+        if random.random() < stub.error_rate:
+            stub.count("errors")
+            self._send(503, b"Service Unavailable", "text/plain")
+            return
+        items = stub.items(int(params.get("nx", 60)), int(params.get("ny", 127)),
+                           params.get("base_date", ""), params.get("base_time", ""))
+        self._send(200, forecast_page(items, int(params.get("pageNo", 1)), int(params.get("numOfRows", 1000))))
+
+
+class KmaStubServer(StubServer):
+    """getVilageFcst 대역. 픽스처 항목을 요청한 페이지만큼 잘라 돌려줍니다.
+
+    fixture_path를 주면 실제 API에서 저장해 둔 응답(JSON)의 항목을 모든 격자에 그대로 씁니다.
+    days는 생성 픽스처의 예보 일수로, 4일(약 1,030개)이면 기본 PAGE_SIZE에서 2페이지가 됩니다.
+    """
+
+    handler_class = _KmaHandler
+
+    def __init__(self, latency_ms=80.0, jitter_ms=40.0, error_rate=0.0, days=4, fixture_path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.days = days
+        self.recorded_items = None
+        if fixture_path:
+            with open(fixture_path, encoding="utf-8") as f:
+                self.recorded_items = json.load(f)["response"]["body"]["items"]["item"]
+
+    @property
+    def url(self):
+        return self.base_url + KMA_FORECAST_PATH
+
+    def delay(self):
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def items(self, nx, ny, base_date, base_time):
+        if self.recorded_items is not None:
+            return self.recorded_items
+        return self._generated_items(nx, ny, base_date, base_time)
+
+    @lru_cache(maxsize=1024)
+    def _generated_items(self, nx, ny, base_date, base_time):
+        try:
+            base_dt = datetime.strptime(base_date + base_time, "%Y%m%d%H%M")
+        except ValueError:
+            base_dt = None
+        return make_forecast_items(nx, ny, base_dt, self.days)
+
+
+# --- OpenAI ---
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        stub = self.stub
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, b"{}")
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        stub.count("requests")
+        if random.random() < stub.error_rate:
+            stub.count("errors")
+            self._send(503, json.dumps({"error": {"message": "stub overloaded", "type": "server_error"}}).encode())
+            return
+
+        model = request.get("model", "stub")
+        tokens = stub.tokens()
+        time.sleep(stub.ttft_ms / 1000)
+        if not request.get("stream"):
+            self._send(200, json.dumps(stub.completion(model, "".join(tokens))).encode())
+            return
+
+        # Content-Length 없이 이어 보내야 하므로 chunked 전송을 씁니다.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = 1 / stub.tokens_per_sec
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(interval)
+            self._write_event(stub.chunk(model, {"role": "assistant", "content": token} if i == 0 else {"content": token}))
+        self._write_event(stub.chunk(model, {}, finish_reason="stop"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+        stub.count("tokens", len(tokens))
+
+    def _write_event(self, payload):
+        self._write_chunk(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class OpenAIStubServer(StubServer):
+    """/v1/chat/completions 대역. ttft_ms 뒤에 첫 토큰을, 이후 초당 tokens_per_sec개씩 SSE로 보냅니다."""
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, ttft_ms=300.0, tokens_per_sec=80.0, answer_tokens=120, error_rate=0.0, answer=DEFAULT_ANSWER, **kwargs):
+        super().__init__(**kwargs)
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self._words = answer.split(" ")
+
+    @property
+    def url(self):
+        return self.base_url + "/v1"
+
+    def tokens(self):
+        return [self._words[i % len(self._words)] + " " for i in range(self.answer_tokens)]
+
+    @staticmethod
+    def chunk(model, delta, finish_reason=None):
+        return {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    @staticmethod
+    def completion(model, text):
+        return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kma-port", type=int, default=8001)
+    parser.add_argument("--kma-latency-ms", type=float, default=80.0)
+    parser.add_argument("--kma-error-rate", type=float, default=0.0)
+    parser.add_argument("--kma-fixture", help="저장해 둔 getVilageFcst 응답(JSON) 파일")
+    parser.add_argument("--openai-port", type=int, default=8002)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    args = parser.parse_args()
+
+    kma = KmaStubServer(latency_ms=args.kma_latency_ms, error_rate=args.kma_error_rate,
+                        fixture_path=args.kma_fixture, port=args.kma_port).start()
+    llm = OpenAIStubServer(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec, port=args.openai_port).start()
+    print(f"KMA_FORECAST_URL={kma.url}\nOPENAI_BASE_URL={llm.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        kma.stop()
+        llm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import uuid
+import weakref
+import zlib
+
+# 매 실행마다 다시 그리는 최근 메시지 수
+CHAT_HISTORY_WINDOW = int(os.environ.get("CHAT_HISTORY_WINDOW", "20"))
+# 오래된 메시지를 묶어 보관하는 단위이자, "이전 대화 더 보기" 한 번에 펼치는 메시지 수
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get("CHAT_HISTORY_PAGE_SIZE", "10"))
+
+
+def pack_messages(messages):
+    return zlib.compress(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+
+
+def unpack_messages(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+# --- 보관소 ---
+class MemoryArchive:
+    """오래된 메시지를 페이지 단위로 압축해 세션 안에 보관합니다."""
+
+    def __init__(self):
+        self._pages = []
+
+    def append(self, messages):
+        self._pages.append(pack_messages(messages))
+
+    def load(self, page_no):
+        return unpack_messages(self._pages[page_no])
+
+    @property
+    def nbytes(self):
+        return sum(len(page) for page in self._pages)
+
+    def __len__(self):
+        return len(self._pages)
+
+
+class FileArchive:
+    """오래된 메시지를 압축해 디스크로 내보내고, 세션에는 페이지 수만 남깁니다.
+
+    세션이 끝나 이 객체가 정리되면 세션별 디렉터리도 함께 지웁니다.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, uuid.uuid4().hex)
+        os.makedirs(self.path)
+        self._count = 0
+        weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def _page_path(self, page_no):
+        return os.path.join(self.path, f"{page_no:06d}.json.z")
+
+    def append(self, messages):
+        with open(self._page_path(self._count), "wb") as f:
+            f.write(pack_messages(messages))
+        self._count += 1
+
+    def load(self, page_no):
+        with open(self._page_path(page_no), "rb") as f:
+            return unpack_messages(f.read())
+
+    @property
+    def nbytes(self):
+        return 0  # 메모리에는 남기지 않습니다.
+
+    def __len__(self):
+        return self._count
+
+
+def make_archive():
+    """CHAT_HISTORY_SPILL_DIR 환경 변수가 있으면 디스크, 없으면 메모리(압축)에 보관합니다."""
+    directory = os.environ.get("CHAT_HISTORY_SPILL_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        return FileArchive(directory)
+    return MemoryArchive()
+
+
+# --- 대화 기록 ---
+class ChatHistory:
+    """세션별 대화 기록. 최근 window개만 그리고, 그보다 오래된 메시지는 페이지 단위로 압축해 둡니다.
+
+    평소에는 최근 메시지만 다루므로 대화가 길어져도 실행당 렌더링 비용과 세션 메모리가 일정합니다.
+    "이전 대화 더 보기"를 누르면 보관된 페이지를 한 장씩 풀어서 보여주고, 새 메시지가 오면 다시 접습니다.
+    """
+
+    def __init__(self, window=CHAT_HISTORY_WINDOW, page_size=CHAT_HISTORY_PAGE_SIZE, archive=None):
+        self.window = window
+        self.page_size = page_size
+        self.archive = archive if archive is not None else make_archive()
+        self._recent = []  # 아직 보관하지 않은 최근 메시지 (window ~ window + page_size - 1개)
+        self._archived_count = 0
+        self._loaded_pages = {}  # page no -> messages (펼쳐 둔 페이지만)
+        self.earlier_pages_shown = 0
+
+    def append(self, role, content):
+        self._recent.append({"role": role, "content": content})
+        # 화면 밖으로 밀려난 메시지가 한 페이지만큼 쌓이면 통째로 보관소로 보냅니다.
+        if len(self._recent) >= self.window + self.page_size:
+            page, self._recent = self._recent[:self.page_size], self._recent[self.page_size:]
+            self.archive.append(page)
+            self._archived_count += len(page)
+        self.collapse()
+
+    # --- 페이징 ---
+    def load_earlier(self):
+        self.earlier_pages_shown += 1
+
+    def collapse(self):
+        """펼친 이전 대화를 접고, 풀어 둔 페이지를 메모리에서 내립니다."""
+        self.earlier_pages_shown = 0
+        self._loaded_pages.clear()
+
+    def visible_count(self):
+        return min(len(self), self.window + self.earlier_pages_shown * self.page_size)
+
+    def hidden_count(self):
+        return len(self) - self.visible_count()
+
+    def has_earlier(self):
+        return self.hidden_count() > 0
+
+    def visible(self):
+        """화면에 그릴 메시지를 오래된 순서로 반환합니다."""
+        count = self.visible_count()
+        if count <= len(self._recent):
+            return self._recent[len(self._recent) - count:]
+        needed = count - len(self._recent)
+        earlier = []
+        page_no = len(self.archive) - 1
+        while len(earlier) < needed and page_no >= 0:
+            earlier = self._load_page(page_no) + earlier
+            page_no -= 1
+        return earlier[len(earlier) - needed:] + self._recent
+
+    def _load_page(self, page_no):
+        # 한 번 펼친 페이지는 접을 때까지 다시 풀지 않습니다.
+        page = self._loaded_pages.get(page_no)
+        if page is None:
+            page = self._loaded_pages[page_no] = self.archive.load(page_no)
+        return page
+
+    def stats(self):
+        return {
+            "messages": len(self), "recent": len(self._recent), "archived": self._archived_count,
+            "archived_pages": len(self.archive), "archived_bytes": self.archive.nbytes,
+            "earlier_pages_shown": self.earlier_pages_shown,
+        }
+
+    def __len__(self):
+        return self._archived_count + len(self._recent)
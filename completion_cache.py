@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def normalize_content(text):
+    """줄 앞뒤 공백(들여쓰기)과 빈 줄 차이를 없애, 의미가 같은 프롬프트가 같은 키를 갖게 합니다."""
+    lines = (line.strip() for line in text.strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def completion_key(model, messages, api_key_hash=None):
+    """모델과 메시지를 정규화한 뒤 만든 캐시 키. api_key_hash가 주어지면 같은 키로 받은 응답만 적중합니다."""
+    canonical = [{"role": m["role"], "content": normalize_content(m["content"])} for m in messages]
+    payload = json.dumps({"model": model, "messages": canonical}, ensure_ascii=False, sort_keys=True)
+    if api_key_hash is not None:
+        payload = api_key_hash + payload
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def replay_stream(chunks):
+    """저장된 응답 조각을 스트리밍 응답처럼 다시 내보냅니다."""
+    yield from chunks
+
+
+# --- 메모리 백엔드 ---
+class CompletionCache:
+    """프로세스 안에서만 공유하는 응답 캐시. (만료 시각 + LRU 개수 제한)"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, chunks)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, chunks = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return chunks
+
+    def put(self, key, chunks, expires_at):
+        """expires_at은 epoch 초입니다."""
+        with self._lock:
+            self._entries[key] = (expires_at, list(chunks))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --- 디스크 백엔드 ---
+class SqliteCompletionCache:
+    """여러 워커 프로세스가 함께 쓰는 SQLite 기반 응답 캐시. (만료 시각 + 최근 사용 순 개수 제한)"""
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, chunks TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        # 연결은 스레드 간에 공유할 수 없으므로 호출마다 새로 열고 닫습니다.
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT chunks, expires_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def put(self, key, chunks, expires_at):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, chunks, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(list(chunks), ensure_ascii=False), expires_at, now),
+            )
+            conn.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                " SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+
+def make_completion_cache():
+    """COMPLETION_CACHE_PATH 환경 변수가 있으면 디스크 캐시, 없으면 메모리 캐시를 만듭니다."""
+    path = os.environ.get("COMPLETION_CACHE_PATH")
+    if path:
+        return SqliteCompletionCache(path)
+    return CompletionCache()
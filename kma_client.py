@@ -0,0 +1,257 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from telemetry import telemetry
+
+# 연결 수립과 응답 대기 시간을 따로 제한합니다. (connect, read)
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+POOL_MAXSIZE = 10  # 호스트당 최대 연결 수
+
+# 재시도할 만한 일시적인 HTTP 상태 코드
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 헤더를 받은 뒤 본문을 읽는 도중 연결이 끊기거나 시간이 초과된 경우 (stream=True이면 res.raw에서 그대로 올라옵니다)
+BODY_ERRORS = (urllib3.exceptions.ProtocolError, urllib3.exceptions.ReadTimeoutError,
+               requests.exceptions.ChunkedEncodingError)
+
+
+class KmaUnavailableError(Exception):
+    """재시도 후에도 기상청 서버에 접속하지 못했거나, 서킷이 열려 호출을 건너뛴 경우."""
+
+
+class KmaTemporaryError(Exception):
+    """HTTP 200 응답이지만 본문의 결과 코드가 일시적인 서버 오류(DB 오류, 시간 초과, 호출 한도 등)인 경우.
+
+    응답 본문을 읽는 쪽(consume)에서 내면 연결 오류와 같이 재시도합니다.
+    """
+
+    def __init__(self, result_code, message):
+        super().__init__(f"기상청 API 일시 오류 ({result_code}): {message}")
+        self.result_code = result_code
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _error_kind(error):
+    """카운터 라벨용 오류 종류 (HTTP 상태 코드, API 결과 코드 또는 예외 이름)."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status:
+        return str(status)
+    result_code = getattr(error, "result_code", None)
+    return f"result_{result_code}" if result_code else type(error).__name__
+
+
+def backoff_delay(attempt, base=0.3, cap=5.0):
+    """지수 백오프에 full jitter를 적용한 대기 시간(초)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# --- 서킷 브레이커 ---
+class CircuitBreaker:
+    """연속 실패가 쌓이면 일정 시간 동안 호출을 막아, 장애 중인 서버를 계속 두드리지 않게 합니다.
+
+    closed → (failure_threshold회 연속 실패) → open → (reset_timeout 경과) → half-open
+    half-open 상태에서는 한 번만 시험 호출을 허용하고, 성공하면 closed, 실패하면 다시 open이 됩니다.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+# --- 동기 클라이언트 ---
+class KmaClient:
+    """apis.data.go.kr 전용 keep-alive 연결 풀 + 재시도 + 서킷 브레이커.
+
+    limiter(acquire()가 있는 객체)를 주면 재시도를 포함한 HTTP 요청마다 한 번씩 acquire()한 뒤 보냅니다.
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_retries=2, backoff_base=0.3, breaker=None, limiter=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        # 연결이 모두 사용 중이면 새로 열지 않고 반납을 기다립니다. (호스트당 연결 수 제한)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, params, consume=None):
+        """GET 요청을 보내고 정상 응답을 반환합니다. 일시적인 오류는 백오프 후 재시도합니다.
+
+        consume(res)를 주면 본문을 스트리밍으로 읽게 하고 그 반환값을 돌려줍니다.
+        본문을 읽다가 끊긴 경우도 연결 오류와 같이 재시도하며, 끝내 실패하면 KmaUnavailableError를 냅니다.
+        """
+        if not self.breaker.allow():
+            telemetry.count("kma_circuit_rejected")
+            raise KmaUnavailableError("기상청 서버 장애로 잠시 호출을 중단했습니다.")
+
+        with telemetry.span("kma.request") as span:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    telemetry.count("kma_retries")
+                    time.sleep(backoff_delay(attempt - 1, self.backoff_base))
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                telemetry.count("kma_requests")
+                try:
+                    res = self.session.get(url, params=params, timeout=self.timeout, stream=consume is not None)
+                    if res.status_code in RETRY_STATUSES:
+                        res.close()
+                        raise _RetryableStatus(res.status_code)
+                    if res.status_code >= 400:
+                        res.close()
+                        res.raise_for_status()
+                    result = res
+                    if consume is not None:
+                        with res:
+                            result = consume(res)
+                except (requests.ConnectionError, requests.Timeout, _RetryableStatus, KmaTemporaryError) + BODY_ERRORS as e:
+                    telemetry.count("kma_errors", kind=_error_kind(e))
+                    last_error = e
+                    continue
+                except Exception as e:
+                    # 4xx 등은 재시도해도 결과가 같으므로 서킷 판단에는 넣지 않고 그대로 전달합니다.
+                    telemetry.count("kma_errors", kind=_error_kind(e))
+                    self.breaker.record_success()
+                    raise
+                span.set_attribute("attempts", attempt + 1)
+                self.breaker.record_success()
+                return result
+
+            span.set_attribute("attempts", self.max_retries + 1)
+            self.breaker.record_failure()
+            raise KmaUnavailableError(f"기상청 서버에 연결하지 못했습니다. ({last_error})") from last_error
+
+    def close(self):
+        self.session.close()
+
+
+# --- 비동기 클라이언트 ---
+class AsyncKmaClient:
+    """다른 I/O와 함께 await할 수 있는 KmaClient의 비동기 버전 (httpx 기반).
+
+    httpx.AsyncClient는 이벤트 루프에 묶이므로, 루프마다 하나씩 만들어 사용합니다.
+    서킷 브레이커는 기본적으로 동기 클라이언트와 공유합니다.
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_retries=2, backoff_base=0.3, breaker=None):
+        connect_timeout, read_timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.breaker = breaker or kma_client.breaker
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def get(self, url, params, consume):
+        """GET 요청을 보내고 await consume(res)로 본문을 스트리밍으로 읽어 그 반환값을 돌려줍니다.
+
+        본문을 읽다가 끊긴 경우도 연결 오류와 같이 재시도하며, 끝내 실패하면 KmaUnavailableError를 냅니다.
+        """
+        if not self.breaker.allow():
+            telemetry.count("kma_circuit_rejected")
+            raise KmaUnavailableError("기상청 서버 장애로 잠시 호출을 중단했습니다.")
+
+        with telemetry.span("kma.request") as span:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    telemetry.count("kma_retries")
+                    await asyncio.sleep(backoff_delay(attempt - 1, self.backoff_base))
+                telemetry.count("kma_requests")
+                try:
+                    request = self.client.build_request("GET", url, params=params)
+                    res = await self.client.send(request, stream=True)
+                    try:
+                        if res.status_code in RETRY_STATUSES:
+                            raise _RetryableStatus(res.status_code)
+                        res.raise_for_status()
+                        result = await consume(res)
+                    finally:
+                        await res.aclose()
+                except (httpx.TransportError, _RetryableStatus, KmaTemporaryError) as e:
+                    telemetry.count("kma_errors", kind=_error_kind(e))
+                    last_error = e
+                    continue
+                except Exception as e:
+                    telemetry.count("kma_errors", kind=_error_kind(e))
+                    self.breaker.record_success()
+                    raise
+                span.set_attribute("attempts", attempt + 1)
+                self.breaker.record_success()
+                return result
+
+            span.set_attribute("attempts", self.max_retries + 1)
+            self.breaker.record_failure()
+            raise KmaUnavailableError(f"기상청 서버에 연결하지 못했습니다. ({last_error})") from last_error
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+# 모든 세션이 공유하는 연결 풀
+kma_client = KmaClient()
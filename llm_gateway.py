@@ -0,0 +1,263 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from openai import OpenAI
+
+from completion_cache import completion_key, make_completion_cache, replay_stream
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+# 프로세스(= Streamlit 워커)당 동시에 열 수 있는 스트리밍 응답 수
+MAX_INFLIGHT_COMPLETIONS = int(os.environ.get("MAX_INFLIGHT_COMPLETIONS", "16"))
+
+
+def hash_api_key(api_key):
+    """API 키 원문 대신 보관/비교에 사용할 해시."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+# --- 클라이언트 풀 ---
+class ClientPool:
+    """API 키(해시)별 OpenAI 클라이언트를 재사용해 HTTP 연결 풀을 유지합니다. (LRU로 개수 제한)"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._clients = OrderedDict()  # key hash -> OpenAI
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        key = hash_api_key(api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            client = self._clients[key] = OpenAI(api_key=api_key)
+            # 밀려난 클라이언트로 아직 다른 세션의 응답을 받고 있을 수 있으므로 직접 닫지 않습니다.
+            # 마지막 참조가 사라지면 GC가 연결 풀을 닫습니다.
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+        return client
+
+    def __len__(self):
+        return len(self._clients)
+
+
+# --- 동시 실행 제한 ---
+class FairSemaphore:
+    """먼저 기다린 요청이 먼저 들어가는(FIFO) 세마포어."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            turn = threading.Event()
+            self._waiters.append(turn)
+        # release()가 자리를 그대로 넘겨주므로, 깨어나면 바로 실행할 수 있습니다.
+        turn.wait()
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._active -= 1
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# --- 공유 스트림 ---
+class SharedStream:
+    """하나의 upstream 스트림을 여러 구독자가 처음부터 다시 읽을 수 있도록 버퍼링합니다."""
+
+    def __init__(self):
+        self._chunks = []
+        self._done = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def append(self, text):
+        with self._cond:
+            self._chunks.append(text)
+            self._cond.notify_all()
+
+    @property
+    def chunks(self):
+        with self._cond:
+            return list(self._chunks)
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """지금까지 받은 조각부터 시작해, 스트림이 끝날 때까지 텍스트 조각을 내보냅니다."""
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._chunks) and not self._done:
+                    self._cond.wait()
+                chunks = self._chunks[i:]
+                done, error = self._done, self._error
+            i += len(chunks)
+            yield from chunks
+            if done and i >= len(self._chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+def request_key(model, messages, api_key=None):
+    """같은 요청인지 판별하는 키. api_key가 주어지면 같은 키를 쓰는 요청끼리만 합칩니다."""
+    payload = json.dumps({"model": model, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    if api_key is not None:
+        payload = hash_api_key(api_key) + payload
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- 게이트웨이 ---
+class LLMGateway:
+    """OpenAI 스트리밍 호출을 한곳에서 관리합니다.
+
+    - API 키별 클라이언트(연결 풀) 재사용
+    - 프로세스당 동시 스트림 수 제한 (FIFO 대기열)
+    - 진행 중인 동일 요청은 upstream 스트림 하나를 공유
+    - cache_until을 지정한 요청은 완료된 응답을 캐시해 두고, 적중 시 OpenAI를 호출하지 않고 재생
+
+    share_across_keys=False(기본)이면 같은 API 키를 쓰는 요청끼리만 합치고, 캐시된 응답도 같은 키에만 돌려줍니다.
+    서버 공용 키로 운영한다면 모든 세션이 같은 키이므로 자연스럽게 세션 간에 공유됩니다.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT_COMPLETIONS, clients=None, share_across_keys=False, cache=None):
+        self.clients = clients or ClientPool()
+        self.cache = cache if cache is not None else make_completion_cache()
+        self.semaphore = FairSemaphore(max_inflight)
+        self.share_across_keys = share_across_keys
+        self._inflight = {}  # request key -> SharedStream
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def stream_chat(self, api_key, messages, model=DEFAULT_MODEL, cache_until=None):
+        """응답 텍스트 조각을 내보내는 제너레이터를 반환합니다. (st.write_stream에 바로 전달 가능)
+
+        cache_until(epoch 초)을 주면 응답을 그 시각까지 캐시합니다. 캐시된 응답도 같은 스트리밍 형태로 재생됩니다.
+        """
+        cache_key = None
+        if cache_until is not None:
+            # 다른 사용자의 키로 비용을 낸 응답을 아무 키에나 내주지 않도록, 기본적으로 키별로 나눠 캐시합니다.
+            cache_key = completion_key(model, messages, None if self.share_across_keys else hash_api_key(api_key))
+            chunks = self._cache_get(cache_key)
+            if chunks is not None:
+                self.cache_hits += 1
+                telemetry.count("llm_requests", source="cache")
+                return replay_stream(chunks)
+
+        key = request_key(model, messages, None if self.share_across_keys else api_key)
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                telemetry.count("llm_requests", source="coalesced")
+            else:
+                shared = self._inflight[key] = SharedStream()
+                self.upstream_calls += 1
+                telemetry.count("llm_requests", source="upstream")
+                # 요청한 세션이 중간에 끊겨도 다른 구독자를 위해 끝까지 받아 둡니다.
+                # (호출한 쪽의 span 아래에 기록되도록 컨텍스트를 복사해 실행합니다)
+                threading.Thread(target=contextvars.copy_context().run,
+                                 args=(self._produce, key, shared, api_key, model, messages, cache_key, cache_until),
+                                 name="llm-stream", daemon=True).start()
+        return shared.subscribe()
+
+    def _produce(self, key, shared, api_key, model, messages, cache_key=None, cache_until=None):
+        error = None
+        try:
+            with telemetry.span("llm.stream", model=model) as span:
+                queued_at = time.perf_counter()
+                with self.semaphore:
+                    started = time.perf_counter()
+                    telemetry.observe("llm_queue_wait_seconds", started - queued_at)
+                    client = self.clients.get(api_key)
+                    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+                    first_at, tokens = None, 0
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first_at is None:
+                                first_at = time.perf_counter()
+                                telemetry.observe("llm_ttft_seconds", first_at - started)
+                            tokens += 1  # 스트림 조각 하나를 토큰 하나로 셉니다.
+                            shared.append(chunk.choices[0].delta.content)
+                    if tokens:
+                        telemetry.count("llm_tokens", tokens)
+                        elapsed = time.perf_counter() - first_at
+                        if elapsed > 0:
+                            telemetry.observe("llm_tokens_per_second", tokens / elapsed)
+                    span.set_attribute("tokens", tokens)
+            if cache_key is not None:
+                self._cache_put(cache_key, shared.chunks, cache_until)
+        except Exception as e:
+            telemetry.count("llm_errors", kind=type(e).__name__)
+            error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            shared.finish(error)
+
+    # 캐시는 부가 기능이므로, 백엔드 오류(예: SQLite "database is locked")는 응답을 실패시키지 않습니다.
+    def _cache_get(self, cache_key):
+        try:
+            return self.cache.get(cache_key)
+        except Exception as e:
+            logger.warning("응답 캐시 조회 실패, 캐시 없이 진행합니다: %s", e)
+            telemetry.count("llm_cache_errors", op="get", kind=type(e).__name__)
+            return None
+
+    def _cache_put(self, cache_key, chunks, cache_until):
+        try:
+            self.cache.put(cache_key, chunks, cache_until)
+        except Exception as e:
+            logger.warning("응답 캐시 저장 실패: %s", e)
+            telemetry.count("llm_cache_errors", op="put", kind=type(e).__name__)
+
+    def stats(self):
+        return {
+            "active": self.semaphore.active, "queued": self.semaphore.queued,
+            "inflight_requests": len(self._inflight), "clients": len(self.clients),
+            "upstream_calls": self.upstream_calls, "coalesced": self.coalesced, "cache_hits": self.cache_hits,
+        }
+
+
+# 프로세스 전역 게이트웨이 (모든 세션 공유)
+llm_gateway = LLMGateway()
@@ -1,3 +1,7 @@
+import math
+
+import numpy as np
+
 # --- 계층적 도시 데이터 구조 ---
 HIERARCHICAL_CITY_COORDS = {
     "서울특별시": {
@@ -124,4 +128,136 @@ HIERARCHICAL_CITY_COORDS = {
     "제주특별자치도": {
         "_default": {"nx": 53, "ny": 38}, "제주시": {"nx": 53, "ny": 38}, "서귀포시": {"nx": 53, "ny": 33}
     },
-}
\ No newline at end of file
+}
+
+# --- 조회용 색인 ---
+# 사이드바에서 시/도 전체를 뜻하는 구/군 선택지
+ALL_DISTRICTS = "(전체)"
+
+# 기상청 동네예보 격자 (Lambert Conformal Conic) 상수
+GRID_EARTH_RADIUS_KM = 6371.00877
+GRID_SPACING_KM = 5.0
+GRID_STANDARD_LAT1 = 30.0
+GRID_STANDARD_LAT2 = 60.0
+GRID_ORIGIN_LON = 126.0
+GRID_ORIGIN_LAT = 38.0
+GRID_ORIGIN_X = 43
+GRID_ORIGIN_Y = 136
+
+
+def _lcc_constants():
+    re = GRID_EARTH_RADIUS_KM / GRID_SPACING_KM
+    slat1, slat2 = math.radians(GRID_STANDARD_LAT1), math.radians(GRID_STANDARD_LAT2)
+    olat = math.radians(GRID_ORIGIN_LAT)
+    sn = math.log(math.cos(slat1) / math.cos(slat2)) / math.log(
+        math.tan(math.pi / 4 + slat2 / 2) / math.tan(math.pi / 4 + slat1 / 2))
+    sf = math.tan(math.pi / 4 + slat1 / 2) ** sn * math.cos(slat1) / sn
+    ro = re * sf / math.tan(math.pi / 4 + olat / 2) ** sn
+    return re * sf, sn, ro
+
+
+_LCC_RE_SF, _LCC_SN, _LCC_RO = _lcc_constants()
+
+
+def project_to_grid(lat, lon):
+    """위경도(도)를 반올림 전의 격자 좌표(x, y) 실수 배열로 바꿉니다. 스칼라와 배열 모두 받습니다."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ra = _LCC_RE_SF / np.tan(np.pi / 4 + np.radians(lat) / 2) ** _LCC_SN
+    theta = np.radians(lon) - math.radians(GRID_ORIGIN_LON)
+    theta = (theta + np.pi) % (2 * np.pi) - np.pi
+    theta = theta * _LCC_SN
+    x = ra * np.sin(theta) + GRID_ORIGIN_X
+    y = _LCC_RO - ra * np.cos(theta) + GRID_ORIGIN_Y
+    return x, y
+
+
+def latlon_to_grid(lat, lon):
+    """위경도(도)를 기상청 예보 격자 (nx, ny)로 바꿉니다. 배열을 넘기면 한 번에 변환합니다."""
+    x, y = project_to_grid(lat, lon)
+    return np.floor(x + 0.5).astype(np.int64), np.floor(y + 0.5).astype(np.int64)
+
+
+class LocationRegistry:
+    """HIERARCHICAL_CITY_COORDS를 import 시점에 한 번 정리해 둔 조회용 색인.
+
+    - 시/도별 구/군 목록(정렬됨)과 선택지 인덱스를 미리 만들어 두어 rerun마다 다시 계산하지 않습니다.
+    - (시/도, 구/군) → 격자는 dict 한 번으로 찾습니다.
+    - 격자 → 구/군 역색인으로, 같은 격자를 쓰는 지역의 조회를 하나로 묶을 수 있습니다.
+    - 위경도 배열을 받아 격자 변환과 가장 가까운 구/군 찾기를 한 번에 처리합니다.
+    """
+
+    def __init__(self, city_coords=HIERARCHICAL_CITY_COORDS):
+        self.city_coords = city_coords
+        self.sido_names = tuple(city_coords)
+        self._sido_index = {sido: i for i, sido in enumerate(self.sido_names)}
+
+        self._districts = {}
+        self._gungu_options = {}
+        self._gungu_index = {}
+        self._coords = {}  # (sido, gungu) -> {"nx", "ny"}
+        by_cell = {}
+        for sido, districts in city_coords.items():
+            names = tuple(sorted(g for g in districts if g != "_default"))
+            options = (ALL_DISTRICTS,) + names
+            self._districts[sido] = names
+            self._gungu_options[sido] = options
+            self._gungu_index[sido] = {gungu: i for i, gungu in enumerate(options)}
+            self._coords[(sido, ALL_DISTRICTS)] = districts["_default"]
+            for gungu in names:
+                coords = self._coords[(sido, gungu)] = districts[gungu]
+                by_cell.setdefault((coords["nx"], coords["ny"]), []).append((sido, gungu))
+        self._by_cell = {cell: tuple(names) for cell, names in by_cell.items()}
+        self.cells = tuple(sorted({(c["nx"], c["ny"]) for c in self._coords.values()}))
+
+        # 가장 가까운 구/군 찾기용 배열 (행 순서 = self._district_names)
+        self._district_names = tuple(name for names in self._by_cell.values() for name in names)
+        self._district_xy = np.array(
+            [(self._coords[name]["nx"], self._coords[name]["ny"]) for name in self._district_names], dtype=np.float64)
+
+    # --- 선택지 ---
+    def sido_index(self, sido):
+        return self._sido_index[sido]
+
+    def districts(self, sido):
+        """시/도에 속한 구/군 이름 (가나다순)."""
+        return self._districts[sido]
+
+    def gungu_options(self, sido):
+        """사이드바 구/군 선택지. 맨 앞은 ALL_DISTRICTS입니다."""
+        return self._gungu_options[sido]
+
+    def gungu_index(self, sido, gungu):
+        return self._gungu_index[sido].get(gungu, 0)
+
+    # --- 격자 ---
+    def coords(self, sido, gungu=ALL_DISTRICTS):
+        """{"nx", "ny"} 좌표. 구/군이 ALL_DISTRICTS이면 시/도 대표 좌표를 반환합니다."""
+        return self._coords[(sido, gungu)]
+
+    def cell(self, sido, gungu=ALL_DISTRICTS):
+        coords = self._coords[(sido, gungu)]
+        return coords["nx"], coords["ny"]
+
+    def districts_in_cell(self, nx, ny):
+        """같은 격자를 쓰는 (시/도, 구/군) 목록."""
+        return self._by_cell.get((nx, ny), ())
+
+    # --- 위경도 ---
+    def nearest_districts(self, lat, lon, chunk_size=4096):
+        """각 위경도에서 격자 거리로 가장 가까운 (시/도, 구/군)을 찾습니다. (배열 입력, 리스트 반환)
+
+        거리 행렬이 커지지 않도록 chunk_size개씩 나눠 계산합니다.
+        """
+        x, y = project_to_grid(np.atleast_1d(lat), np.atleast_1d(lon))
+        points = np.stack([x, y], axis=-1)
+        nearest = np.empty(len(points), dtype=np.int64)
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            dist = ((chunk[:, None, :] - self._district_xy[None, :, :]) ** 2).sum(axis=-1)
+            nearest[start:start + chunk_size] = dist.argmin(axis=1)
+        return [self._district_names[i] for i in nearest]
+
+
+# 프로세스 전역 색인 (import 시 한 번 생성)
+location_registry = LocationRegistry()
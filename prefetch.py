@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from kma_client import KmaClient, kma_client
+from locations import location_registry
+from weather import forecast_cache, forecast_key, get_base_datetime, get_forecast_summary, get_next_publication
+
+
+def unique_grid_cells(registry=location_registry):
+    """모든 시/도·구/군 좌표를 중복 없는 (nx, ny) 격자 목록으로 만듭니다."""
+    return list(registry.cells)
+
+
+class RateLimiter:
+    """초당 요청 수를 제한하는 토큰 버킷."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ForecastPrefetcher:
+    """발표 주기마다 모든 격자의 예보를 미리 받아 공유 캐시에 채우는 백그라운드 작업자.
+
+    요청 시점의 날씨 조회가 거의 항상 캐시 적중이 되도록, 예보가 API에 올라온 직후
+    (발표 시각 + 게시 지연 + start_offset) 격자별로 한 번씩 조회합니다.
+
+    rate_per_sec는 격자 수가 아니라 실제 HTTP 요청 수(페이지, 재시도 포함)의 상한입니다.
+    재시도는 전용 KmaClient가 max_retries/backoff_base로 하고, 서킷 브레이커는 채팅 요청과 공유합니다.
+    """
+
+    def __init__(self, service_key, cells=None, max_workers=4, rate_per_sec=5.0,
+                 max_retries=3, backoff_base=1.0, start_offset=timedelta(minutes=1),
+                 cache=forecast_cache):
+        self.service_key = service_key
+        self.cells = cells if cells is not None else unique_grid_cells()
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_per_sec)
+        self.client = KmaClient(max_retries=max_retries, backoff_base=backoff_base,
+                                breaker=kma_client.breaker, limiter=self.rate_limiter)
+        self.start_offset = start_offset
+        self.cache = cache
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "state": "stopped", "cells": len(self.cells), "done": 0, "failed": 0,
+            "base_date": None, "base_time": None, "started_at": None, "finished_at": None,
+            "duration_sec": None, "next_run_at": None, "last_error": None, "refresh_count": 0,
+        }
+
+    # --- 상태 조회 ---
+    def stats(self):
+        """진행 상황과 마지막 갱신 결과를 반환합니다."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _update(self, **kwargs):
+        with self._lock:
+            self._stats.update(kwargs)
+
+    def _increment(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- 실행 제어 ---
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kma-prefetch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            base_dt = get_base_datetime()
+            self.refresh(base_dt)
+            # 다음 예보가 API에 올라온 뒤 조금 더 기다렸다가 다시 갱신합니다.
+            next_run = get_next_publication(base_dt) + self.start_offset
+            self._update(state="waiting", next_run_at=next_run.isoformat(timespec="seconds"))
+            self._stop.wait(max(0.0, (next_run - datetime.now()).total_seconds()))
+        self._update(state="stopped", next_run_at=None)
+
+    # --- 갱신 ---
+    def refresh(self, base_dt=None):
+        """모든 격자의 예보를 한 번씩 받아 캐시에 채웁니다."""
+        base_dt = base_dt or get_base_datetime()
+        started = time.monotonic()
+        self._update(state="running", done=0, failed=0, last_error=None,
+                     base_date=base_dt.strftime("%Y%m%d"), base_time=base_dt.strftime("%H%M"),
+                     started_at=datetime.now().isoformat(timespec="seconds"), finished_at=None, duration_sec=None)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kma-prefetch-cell") as pool:
+            futures = [pool.submit(self._fetch_cell, nx, ny) for nx, ny in self.cells]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    self._increment("done")
+                except Exception as e:
+                    self._increment("failed")
+                    self._update(last_error=str(e))
+
+        with self._lock:
+            self._stats["refresh_count"] += 1
+        self._update(state="idle", finished_at=datetime.now().isoformat(timespec="seconds"),
+                     duration_sec=round(time.monotonic() - started, 3))
+
+    def _fetch_cell(self, nx, ny):
+        if self._stop.is_set():
+            return
+        # 이미 채팅 요청으로 채워진 격자는 호출 한도를 쓰지 않고 건너뜁니다.
+        if self.cache.get(forecast_key(nx, ny, get_base_datetime())) is not None:
+            return
+        return get_forecast_summary(nx, ny, self.service_key, cache=self.cache, allow_stale=False, client=self.client)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def ensure_prefetcher(service_key, **kwargs):
+    """프로세스당 하나의 프리페처를 시작하고 반환합니다. (이미 실행 중이면 그대로 반환)"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None or not _prefetcher.running:
+            _prefetcher = ForecastPrefetcher(service_key, **kwargs).start()
+        return _prefetcher
+
+
+def get_prefetcher():
+    return _prefetcher
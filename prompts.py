@@ -0,0 +1,173 @@
+import logging
+import math
+import os
+import re
+import threading
+
+from completion_cache import normalize_content
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# 입력 토큰 상한 (system + user). 넘으면 사용자 요청 문구부터 줄입니다.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "1500"))
+# 사용자 정보 항목(TPO 등 자유 입력) 하나당 토큰 상한. 넘는 부분은 잘라 전체 상한을 넘지 않게 합니다.
+PROFILE_FIELD_TOKEN_LIMIT = int(os.environ.get("PROFILE_FIELD_TOKEN_LIMIT", "60"))
+TRUNCATION_MARK = "…"
+
+# --- 고정 부분 ---
+# 요청마다 바뀌는 값(지역, 날짜 등)을 넣지 않아야 모든 요청에서 바이트 단위로 같은 앞부분이 되어
+# provider 쪽 prefix 캐시에 걸립니다. 줄 앞 들여쓰기/빈 줄은 import 시 한 번 정리합니다.
+SYSTEM_PROMPT = normalize_content("""
+    당신은 사용자의 개인 정보, TPO, 패션 취향, 퍼스널 컬러와 **선택된 날짜의 날씨**를 종합 분석하여 패션을 추천하는 전문 AI 스타일리스트입니다.
+    **[답변 생성 규칙]**
+    1. **답변 시작**: 가장 먼저, 어떤 사용자의 정보를 바탕으로 추천하는지 핵심만 요약해서 알려주세요.
+    2. **날씨 정보**: 사용자 정보의 지역과 날짜로 '**(지역)**의 **(날짜)** 날씨 정보'라는 제목의 섹션을 만들고, 그 아래에 전달받은 날씨 데이터를 보여주세요. **날씨 정보는 하루 동안의 기온 변화(최저/최고 기온)를 기준으로 설명합니다.**
+    3. **패션 추천**: '패션 추천' 섹션에서 날씨, TPO, 퍼스널 컬러 등을 모두 고려하여 1~2가지의 완성된 착장을 제안합니다.
+    4. **스타일링 팁**: '스타일링 팁' 섹션에서 추가적인 팁을 제안합니다.
+    5. **우산 안내 (조건부)**: 만약 날씨 정보에 '**비 또는 눈 소식이 있습니다.**' 라는 내용이 포함되어 있다면, '우산 챙기세요! ☔️' 라는 섹션을 추가하고 상냥하게 알려주세요.
+    6. **말투**: 모든 답변은 친절하고 전문적인 말투를 사용해주세요.
+""")
+# user 메시지의 첫 줄도 고정이므로 캐시 가능한 앞부분에 포함됩니다.
+USER_LEAD = "아래 날씨와 사용자 정보를 바탕으로, 요청에 맞는 패션을 추천해줘."
+
+
+class PromptBudgetError(Exception):
+    """고정 부분과 필수 항목만으로도 토큰 상한을 넘는 경우."""
+
+
+# --- 토큰 수 계산 ---
+class EstimateTokenizer:
+    """외부 패키지 없이 쓰는 보수적인(많게 세는) 토큰 수 추정.
+
+    영문/숫자/기호는 4글자당 1토큰, 한글 등 그 밖의 글자는 글자당 1토큰으로 셉니다.
+    """
+
+    name = "estimate"
+    _ascii = re.compile(r"[\x00-\x7f]")
+
+    def count(self, text):
+        ascii_chars = len(self._ascii.findall(text))
+        return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+class TiktokenTokenizer:
+    """tiktoken으로 실제 모델과 같은 방식으로 셉니다. (pip install tiktoken)"""
+
+    def __init__(self, encoding="o200k_base"):
+        import tiktoken
+
+        self.name = f"tiktoken:{encoding}"
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text):
+        return len(self._encoding.encode(text))
+
+
+def make_tokenizer():
+    """tiktoken이 설치되어 있으면 그것을, 없으면 추정 토크나이저를 씁니다. (PROMPT_TOKENIZER=estimate로 강제)
+
+    tiktoken은 처음 쓸 때 인코딩 파일을 내려받으므로, 외부 네트워크가 막힌 환경 등 어떤 이유로든
+    만들지 못하면 추정 토크나이저로 대신합니다.
+    """
+    if os.environ.get("PROMPT_TOKENIZER") != "estimate":
+        try:
+            return TiktokenTokenizer(os.environ.get("PROMPT_TOKENIZER_ENCODING", "o200k_base"))
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning("tiktoken을 쓸 수 없어 추정 토크나이저를 사용합니다: %s", e)
+    return EstimateTokenizer()
+
+
+# --- 조립 ---
+class BuiltPrompt:
+    """조립된 메시지와 토큰 통계."""
+
+    __slots__ = ("messages", "prefix_tokens", "total_tokens", "truncated")
+
+    def __init__(self, messages, prefix_tokens, total_tokens, truncated):
+        self.messages = messages
+        self.prefix_tokens = prefix_tokens  # 모든 요청에 공통인 앞부분 (system + USER_LEAD)
+        self.total_tokens = total_tokens
+        self.truncated = truncated
+
+    @property
+    def cacheable_ratio(self):
+        return self.prefix_tokens / self.total_tokens if self.total_tokens else 0.0
+
+
+class PromptBuilder:
+    """고정 앞부분(system + user 첫 줄)과 요청별 뒷부분(날씨, 사용자 정보, 요청)을 나눠 메시지를 만듭니다.
+
+    뒷부분은 여러 요청이 공유할 가능성이 높은 순서(날씨 → 사용자 정보 → 요청)로 붙이고,
+    토큰 상한을 넘으면 마지막의 사용자 요청 문구를 줄입니다. 사용자 정보 항목은 clip()으로 미리 줄여 넣습니다.
+    """
+
+    def __init__(self, system=SYSTEM_PROMPT, lead=USER_LEAD, tokenizer=None, budget=PROMPT_TOKEN_BUDGET):
+        self.system = system
+        self.lead = lead
+        self.budget = budget
+        self._tokenizer = tokenizer
+        self._prefix_tokens = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        # 전역 빌더가 import 시점에 네트워크를 쓰지 않도록 처음 build할 때 만듭니다.
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    self._tokenizer = make_tokenizer()
+        return self._tokenizer
+
+    @property
+    def prefix_tokens(self):
+        if self._prefix_tokens is None:
+            self._prefix_tokens = self.tokenizer.count(self.system) + self.tokenizer.count(self.lead + "\n")
+        return self._prefix_tokens
+
+    def build(self, sections, request):
+        """sections: [(제목, 본문)] 목록, request: 사용자 요청 문구."""
+        body = "\n".join(f"[{title}]\n{normalize_content(text)}" for title, text in sections)
+        fixed = f"{self.lead}\n{body}\n[사용자 요청]\n"
+        request = normalize_content(request)
+
+        used = self.tokenizer.count(self.system) + self.tokenizer.count(fixed)
+        if used > self.budget:
+            raise PromptBudgetError(f"프롬프트가 토큰 상한을 넘습니다. ({used} > {self.budget})")
+        fitted = self._fit(request, self.budget - used)
+        truncated = fitted != request
+        if truncated:
+            telemetry.count("prompt_truncations")
+
+        messages = [{"role": "system", "content": self.system}, {"role": "user", "content": fixed + fitted}]
+        built = BuiltPrompt(messages, self.prefix_tokens, used + self.tokenizer.count(fitted), truncated)
+        telemetry.observe("prompt_tokens", built.total_tokens)
+        telemetry.observe("prompt_cacheable_ratio", built.cacheable_ratio)
+        return built
+
+    def clip(self, text, limit=PROFILE_FIELD_TOKEN_LIMIT):
+        """사용자 정보 항목 하나를 limit 토큰 이하로 줄입니다. (줄 바꿈은 공백으로 바꿉니다)"""
+        text = " ".join(str(text).split())
+        clipped = self._fit(text, limit)
+        if clipped != text:
+            telemetry.count("prompt_truncations")
+        return clipped
+
+    def _fit(self, text, limit):
+        """text가 limit 토큰 안에 들어오도록 뒤를 잘라 냅니다. (글자 수 기준 이분 탐색)"""
+        if self.tokenizer.count(text) <= limit:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.tokenizer.count(text[:mid] + TRUNCATION_MARK) <= limit:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + TRUNCATION_MARK if lo else ""
+
+
+# 프로세스 전역 빌더 (토크나이저는 처음 쓸 때 한 번만 만듭니다)
+prompt_builder = PromptBuilder()
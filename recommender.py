@@ -0,0 +1,93 @@
+import time
+from datetime import datetime
+
+from llm_gateway import DEFAULT_MODEL, llm_gateway
+from locations import ALL_DISTRICTS, location_registry
+from prompts import prompt_builder
+from telemetry import telemetry
+from weather import get_base_datetime, get_kma_weather_forecast, get_next_publication
+
+# 사이드바 초기값이자, 배치 입력에서 빠진 항목의 기본값
+DEFAULT_USER_INFO = {
+    "sido": "서울특별시", "gungu": ALL_DISTRICTS, "gender": "여성", "age": "20대", "height": "", "weight": "",
+    "style_preference": "캐주얼", "tpo": "일상", "personal_color": "모름",
+}
+
+
+def new_user_info(**overrides):
+    """기본값에 오늘 날짜를 더한 사용자 정보 dict."""
+    info = dict(DEFAULT_USER_INFO, date=datetime.now().date())
+    info.update(overrides)
+    return info
+
+
+def resolve_location(user_info):
+    """사용자 정보의 시/도·구/군으로 예보 격자 좌표와 표시용 지역 이름을 구합니다."""
+    sido, gungu = user_info["sido"], user_info["gungu"]
+    coords = location_registry.coords(sido, gungu)
+    location_name = f"{sido} {gungu}" if gungu != ALL_DISTRICTS else sido
+    return coords, location_name
+
+
+def is_weather_error(weather_info):
+    return "오류" in weather_info
+
+
+def lookup_weather(user_info, service_key):
+    """사용자가 고른 지역/날짜의 날씨 요약 문구. 실패하면 '오류'로 시작하는 문구를 반환합니다."""
+    coords, _ = resolve_location(user_info)
+    return get_kma_weather_forecast(coords, service_key, user_info["date"])
+
+
+def build_prompt(user_info, weather_info, request, builder=None):
+    """OpenAI에 보낼 메시지를 만듭니다. 고정 앞부분 + 요청별 뒷부분으로 나뉜 BuiltPrompt를 반환합니다."""
+    builder = builder or prompt_builder
+    _, location_name = resolve_location(user_info)
+    # TPO 같은 자유 입력(배치 프로필은 모든 항목)이 길어도 매 턴 토큰 상한 오류가 나지 않도록 항목마다 줄입니다.
+    field = lambda name: builder.clip(user_info.get(name))
+    user_info_text = (
+        f"- 지역: {location_name}\n- 날짜: {user_info['date'].strftime('%Y년 %m월 %d일')}\n"
+        f"- 성별: {field('gender')}\n- 나이: {field('age')}\n"
+        f"- TPO: {field('tpo')}\n- 선호 스타일: {field('style_preference')}\n"
+        f"- 퍼스널 컬러: {field('personal_color')}"
+    )
+    with telemetry.span("prompt.build") as span:
+        built = builder.build([("선택한 날짜의 날씨 정보", weather_info), ("사용자 정보", user_info_text)], request)
+        span.set_attribute("tokens", built.total_tokens)
+        span.set_attribute("cacheable_ratio", round(built.cacheable_ratio, 3))
+        return built
+
+
+def build_messages(user_info, weather_info, request):
+    """OpenAI에 보낼 system/user 메시지 목록."""
+    return build_prompt(user_info, weather_info, request).messages
+
+
+def forecast_cache_until(now=None):
+    """날씨 요약이 바뀌는 다음 예보 발표 시각 (epoch 초). 추천 응답 캐시 만료 시각으로 씁니다."""
+    return get_next_publication(get_base_datetime(now)).timestamp()
+
+
+def stream_recommendation(api_key, user_info, weather_info, request, cacheable=False, model=DEFAULT_MODEL, gateway=llm_gateway):
+    """추천 응답 텍스트 조각을 내보내는 제너레이터. cacheable이면 다음 예보 발표 시각까지 응답을 캐시합니다."""
+    started = time.perf_counter()
+    stream = gateway.stream_chat(
+        api_key, build_messages(user_info, weather_info, request), model=model,
+        cache_until=forecast_cache_until() if cacheable else None,
+    )
+    return _observe_first_chunk(stream, started)
+
+
+def _observe_first_chunk(stream, started):
+    # 프롬프트 작성부터 첫 조각까지 (대기열 + upstream TTFT, 캐시 적중 시 거의 0)
+    first = True
+    for chunk in stream:
+        if first:
+            telemetry.observe("recommendation_ttft_seconds", time.perf_counter() - started)
+            first = False
+        yield chunk
+
+
+def generate_recommendation(api_key, user_info, weather_info, request, cacheable=False, model=DEFAULT_MODEL, gateway=llm_gateway):
+    """stream_recommendation의 응답을 끝까지 받아 하나의 문자열로 반환합니다."""
+    return "".join(stream_recommendation(api_key, user_info, weather_info, request, cacheable, model, gateway))
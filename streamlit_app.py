@@ -1,6 +1,5 @@
+import os
 import streamlit as st
-import requests
-from openai import OpenAI
 from datetime import datetime, timedelta
 
 # --- 페이지 기본 설정 ---
@@ -11,27 +10,51 @@ st.set_page_config(
 )
 
 # --- 계층적 도시 데이터 구조 (locations.py 파일에서 불러왔다고 가정) ---
-# 이 데이터는 별도의 locations.py 파일에 저장되어 있어야 합니다.
-from locations import HIERARCHICAL_CITY_COORDS
-
-
-# --- 사이드바 ---
-with st.sidebar:
-    st.header("API 키 설정 🔑")
-    openai_api_key = st.text_input("OpenAI API Key", type="password")
-    kma_service_key = st.text_input("기상청 API 서비스 키", type="password")
-    
-    st.divider()
-
+# 이 데이터는 별도의 locations.py 파일에 저장되어 있어야 합니다. 선택지/좌표 조회는 import 시 만들어 둔 색인을 씁니다.
+from locations import ALL_DISTRICTS, location_registry
+# 예보 캐시가 rerun 사이에도 유지되도록 날씨 조회 로직은 별도 모듈에 둡니다.
+from weather import get_base_datetime, submit_weather_forecast
+from prefetch import ensure_prefetcher
+from chat_history import ChatHistory
+# 날씨 조회/프롬프트 작성/LLM 호출은 화면과 분리된 모듈에 있습니다. (batch.py도 같은 로직을 사용)
+from recommender import is_weather_error, lookup_weather, new_user_info, resolve_location, stream_recommendation
+from telemetry import start_metrics_server, telemetry
+
+# --- (선택) 백그라운드 예보 프리페치 ---
+# KMA_PREFETCH_SERVICE_KEY 환경 변수가 있으면 발표 주기마다 전국 격자의 예보를 미리 받아둡니다.
+prefetch_service_key = os.environ.get("KMA_PREFETCH_SERVICE_KEY")
+prefetcher = ensure_prefetcher(prefetch_service_key) if prefetch_service_key else None
+
+# --- (선택) 성능 계측 ---
+# METRICS_PORT가 있으면 워커마다 /metrics(Prometheus), /traces(OTLP JSON)를 내보냅니다. (워커별로 다른 포트 지정)
+if os.environ.get("METRICS_PORT"):
+    start_metrics_server(int(os.environ["METRICS_PORT"]))
+# TELEMETRY_PANEL=1 이면 사이드바에 직전 채팅 요청의 단계별 소요 시간과 카운터를 보여줍니다.
+TELEMETRY_PANEL = os.environ.get("TELEMETRY_PANEL") == "1"
+
+# 지역/날짜가 정해지면 채팅 입력 전에 미리 날씨 조회를 시작합니다. (SPECULATIVE_WEATHER_PREFETCH=0 으로 끄기)
+SPECULATIVE_WEATHER_PREFETCH = os.environ.get("SPECULATIVE_WEATHER_PREFETCH", "1") != "0"
+
+
+def weather_lookup_key(coords, target_date, service_key):
+    # 발표 주기가 바뀌면 이전에 받아 둔 결과는 쓰지 않습니다.
+    return (coords["nx"], coords["ny"], target_date, get_base_datetime(), service_key)
+
+
+# --- 사이드바: 사용자 정보 패널 ---
+# 패널 안의 위젯을 바꾸면 이 함수만 다시 실행되고, 채팅 기록 등 페이지 전체는 다시 그리지 않습니다.
+@st.fragment
+def profile_panel():
+    with telemetry.span("ui.profile_panel"):
+        render_profile_panel()
+
+
+def render_profile_panel():
     st.header("사용자 정보 🤵‍♀️")
     st.info("정보는 실시간으로 저장됩니다.")
 
     if "user_info" not in st.session_state:
-        st.session_state.user_info = {
-            "sido": "서울특별시", "gungu": "(전체)", "date": datetime.now().date(),
-            "gender": "여성", "age": "20대", "height": "", "weight": "",
-            "style_preference": "캐주얼", "tpo": "일상", "personal_color": "모름"
-        }
+        st.session_state.user_info = new_user_info()
 
     st.subheader("지역 및 날짜 선택")
     
@@ -44,24 +67,20 @@ with st.sidebar:
     )
     st.session_state.user_info["date"] = selected_date
     
-    sido_list = list(HIERARCHICAL_CITY_COORDS.keys())
     selected_sido = st.selectbox(
-        "시/도", sido_list,
-        index=sido_list.index(st.session_state.user_info.get("sido", "서울특별시"))
+        "시/도", location_registry.sido_names,
+        index=location_registry.sido_index(st.session_state.user_info.get("sido", "서울특별시"))
     )
 
+    # 시/도가 바뀌면 구/군을 (전체)로 되돌립니다. 아래 구/군 목록이 새 시/도로 바로 그려지므로 다시 실행할 필요가 없습니다.
     if selected_sido != st.session_state.user_info.get("sido"):
         st.session_state.user_info["sido"] = selected_sido
-        st.session_state.user_info["gungu"] = "(전체)"
-        st.rerun()
-    
-    gungu_list = [g for g in HIERARCHICAL_CITY_COORDS[st.session_state.user_info["sido"]] if g != "_default"]
-    gungu_list.sort()
-    gungu_options = ["(전체)"] + gungu_list
+        st.session_state.user_info["gungu"] = ALL_DISTRICTS
     
+    sido = st.session_state.user_info["sido"]
     selected_gungu = st.selectbox(
-        "구/군", gungu_options,
-        index=gungu_options.index(st.session_state.user_info.get("gungu", "(전체)"))
+        "구/군", location_registry.gungu_options(sido),
+        index=location_registry.gungu_index(sido, st.session_state.user_info.get("gungu", ALL_DISTRICTS))
     )
     st.session_state.user_info["gungu"] = selected_gungu
 
@@ -80,183 +99,134 @@ with st.sidebar:
 
     st.subheader("스타일 정보")
     st.session_state.user_info["style_preference"] = st.selectbox("선호 스타일", ["캐주얼", "미니멀", "스트릿", "포멀", "빈티지", "스포티"])
-    st.session_state.user_info["tpo"] = st.text_input("TPO (시간, 장소, 상황)", placeholder="예: 주말 데이트", value=st.session_state.user_info.get("tpo", "일상"))
+    st.session_state.user_info["tpo"] = st.text_input("TPO (시간, 장소, 상황)", placeholder="예: 주말 데이트", value=st.session_state.user_info.get("tpo", "일상"), max_chars=100)
     st.session_state.user_info["personal_color"] = st.selectbox("퍼스널 컬러", ["모름", "봄 웜톤", "여름 쿨톤", "가을 웜톤", "겨울 쿨톤"])
 
+    # --- 날씨 선제 조회 ---
+    # 선택한 격자/날짜가 바뀌었을 때만 새로 시작하고, 진행 중인 조회는 세션에 보관합니다.
+    kma_service_key = st.session_state.get("kma_service_key")
+    if SPECULATIVE_WEATHER_PREFETCH and kma_service_key:
+        coords, _ = resolve_location(st.session_state.user_info)
+        lookup_key = weather_lookup_key(coords, st.session_state.user_info["date"], kma_service_key)
+        if st.session_state.get("weather_lookup_key") != lookup_key:
+            # 모든 세션이 작업자 풀을 공유하므로, 아직 시작하지 않은 이전 선택의 조회는 취소해 대기열에서 뺍니다.
+            previous = st.session_state.get("weather_lookup")
+            if previous is not None:
+                previous.cancel()
+            st.session_state.weather_lookup_key = lookup_key
+            # 채팅 턴보다 먼저 시작하므로 이 실행의 trace id를 보관해 두고, 결과를 쓴 턴의 계측 패널에 함께 보여줍니다.
+            with telemetry.span("weather.speculative") as span:
+                st.session_state.weather_lookup = submit_weather_forecast(coords, kma_service_key, st.session_state.user_info["date"])
+            st.session_state.weather_lookup_trace = span.trace_id
 
-# --- [수정됨] 날씨 API 함수: 오늘 날씨 처리 로직 개선 ---
-def get_kma_weather_forecast(coords, service_key, target_date):
-    """기상청 단기예보 API로 특정 날짜의 날씨 정보를 가져옵니다."""
-    if not service_key:
-        return "오류: 기상청 서비스 키가 입력되지 않았습니다."
 
-    nx, ny = coords["nx"], coords["ny"]
-    now = datetime.now()
-    
-    publication_times = [2, 5, 8, 11, 14, 17, 20, 23]
-    valid_times = [t for t in publication_times if t <= now.hour]
-    if not valid_times:
-        base_day = now - timedelta(days=1)
-        base_time_hour = 23
-    else:
-        base_day = now
-        base_time_hour = max(valid_times)
-    base_date = base_day.strftime("%Y%m%d")
-    base_time = f"{base_time_hour:02d}00"
-    
-    target_date_str = target_date.strftime("%Y%m%d")
+# --- 사이드바 ---
+with st.sidebar:
+    st.header("API 키 설정 🔑")
+    openai_api_key = st.text_input("OpenAI API Key", type="password", key="openai_api_key")
+    kma_service_key = st.text_input("기상청 API 서비스 키", type="password", key="kma_service_key")
+
+    if prefetcher is not None:
+        with st.expander("예보 프리페치 상태"):
+            st.json(prefetcher.stats(), expanded=False)
+
+    if TELEMETRY_PANEL:
+        with st.expander("성능 계측"):
+            # 프로세스 전역 버퍼에는 다른 세션의 요청도 섞여 있으므로, 이 세션이 남긴 trace만 골라 봅니다.
+            trace = sorted((s for trace_id in st.session_state.get("last_turn_traces", ()) for s in telemetry.trace(trace_id)),
+                           key=lambda s: s.start_ns)
+            if trace:
+                st.caption("직전 채팅 요청의 단계별 소요 시간")
+                st.dataframe(
+                    [{"span": s.name, "ms": round(s.duration * 1000, 1),
+                      "attributes": ", ".join(f"{k}={v}" for k, v in s.attributes.items())} for s in trace],
+                    hide_index=True,
+                )
+            st.json(telemetry.snapshot(), expanded=False)
     
-    url = "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getVilageFcst"
-    params = {"serviceKey": service_key, "pageNo": "1", "numOfRows": "1000",
-              "dataType": "JSON", "base_date": base_date, "base_time": base_time,
-              "nx": str(nx), "ny": str(ny)}
-
-    try:
-        res = requests.get(url, params=params, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        
-        header = data.get("response", {}).get("header", {})
-        if header.get("resultCode") != "00":
-            return f"기상청 API 오류: {header.get('resultMsg', '알 수 없는 오류')}"
-        
-        items = data.get("response", {}).get("body", {}).get("items", {}).get("item", [])
-        if not items: return "오류: 날씨 정보를 찾을 수 없습니다."
-
-        target_day_weather = {}
-        for item in items:
-            if item.get("fcstDate") == target_date_str:
-                category = item.get("category")
-                if category:
-                    if category not in target_day_weather: target_day_weather[category] = []
-                    target_day_weather[category].append(item.get("fcstValue"))
-        
-        if not target_day_weather: return f"오류: {target_date.strftime('%Y년 %m월 %d일')}의 예보가 아직 없습니다."
-            
-        tmn = next((val for val in target_day_weather.get("TMN", [])), None)
-        tmx = next((val for val in target_day_weather.get("TMX", [])), None)
-        
-        # [수정됨] 오늘 날짜의 최저/최고 기온이 없는 경우, 시간대별 기온(TMP)으로 대체
-        if tmn is None or tmx is None:
-            today_temps = [int(t) for t in target_day_weather.get("TMP", [])]
-            if today_temps:
-                tmn = min(today_temps)
-                tmx = max(today_temps)
-        
-        sky_values = target_day_weather.get("SKY", [])
-        sky_codes = {"1": "맑음", "3": "구름 많음", "4": "흐림"}
-        main_sky_code = max(set(sky_values), key=sky_values.count) if sky_values else "1"
-        main_sky = sky_codes.get(main_sky_code, "정보 없음")
-
-        has_precipitation = any(p != "0" for p in target_day_weather.get("PTY", []))
-        if not has_precipitation:
-             pop_values = [int(p) for p in target_day_weather.get("POP", []) if p.isdigit()]
-             if any(p > 40 for p in pop_values):
-                 has_precipitation = True
-
-        weather_info = (
-            f"**기온**: 최저 {tmn or '-'}°C / 최고 {tmx or '-'}°C\n"
-            f"**날씨**: {main_sky}\n"
-            f"**강수 여부**: {'비 또는 눈 소식이 있습니다.' if has_precipitation else '비/눈 소식은 없습니다.'}"
-        )
-        return weather_info
-        
-    except Exception as e:
-        return f"오류: 날씨 정보 조회 중 알 수 없는 문제가 발생했습니다. ({e})"
+    st.divider()
+
+    profile_panel()
 
 
 # --- 메인 챗봇 화면 ---
 st.title("👗 AI 패션 스타일리스트")
 st.write("내 정보와 원하는 날짜의 날씨에 맞는 스타일을 추천받아보세요.")
 
+def select_question(question):
+    # 버튼 콜백은 스크립트보다 먼저 실행되므로, 사이드바의 TPO도 같은 실행에서 바로 갱신됩니다. (추가 rerun 불필요)
+    if "데이트" in question: st.session_state.user_info["tpo"] = "주말 데이트"
+    elif "소개팅" in question: st.session_state.user_info["tpo"] = "소개팅"
+    else: st.session_state.user_info["tpo"] = "일상"
+    st.session_state.selected_question = question
+
 def display_and_handle_buttons():
     st.subheader("어떤 추천을 원하세요? 👇")
     example_questions = ["패션 추천받기 👕", "데이트룩 추천 💖", "소개팅룩 추천해줘 ✨"]
     cols = st.columns(len(example_questions))
     
     for i, question in enumerate(example_questions):
-        if cols[i].button(question, use_container_width=True, key=f"action_btn_{i}"):
-            if "데이트" in question: st.session_state.user_info["tpo"] = "주말 데이트"
-            elif "소개팅" in question: st.session_state.user_info["tpo"] = "소개팅"
-            else: st.session_state.user_info["tpo"] = "일상"
-            return question
-    return None
-
-if "messages" not in st.session_state:
-    st.session_state.messages = [{"role": "assistant", "content": "안녕하세요! 당신만의 스타일리스트가 되어드릴게요. 어떤 도움이 필요하세요?"}]
-
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
+        cols[i].button(question, use_container_width=True, key=f"action_btn_{i}", on_click=select_question, args=(question,))
+    return st.session_state.pop("selected_question", None)
+
+# 대화가 길어져도 최근 메시지만 다시 그리고, 오래된 메시지는 압축해 보관합니다. (chat_history.py)
+if "chat_history" not in st.session_state:
+    st.session_state.chat_history = ChatHistory()
+    st.session_state.chat_history.append("assistant", "안녕하세요! 당신만의 스타일리스트가 되어드릴게요. 어떤 도움이 필요하세요?")
+chat_history = st.session_state.chat_history
+
+# 새 대화도 추천 버튼 위에 이어서 그릴 수 있도록 채팅 영역을 먼저 잡아 둡니다. (응답 후 전체 rerun 불필요)
+chat_area = st.container()
+with chat_area:
+    if chat_history.has_earlier():
+        st.button(f"이전 대화 더 보기 ({chat_history.hidden_count()}개)", key="load_earlier", on_click=chat_history.load_earlier)
+    for msg in chat_history.visible():
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
 
 prompt = display_and_handle_buttons()
+# 추천 버튼의 고정 질문은 같은 조건이면 같은 답이므로 응답을 캐시합니다.
+cacheable = prompt is not None
 if chat_input := st.chat_input("궁금한 스타일을 직접 물어보세요..."):
     prompt = chat_input
+    cacheable = False
 
 if prompt:
     if not openai_api_key or not kma_service_key:
         st.error("사이드바에서 OpenAI API 키와 기상청 서비스 키를 모두 입력해주세요.")
         st.stop()
-    
-    client = OpenAI(api_key=openai_api_key)
 
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
+    chat_history.append("user", prompt)
+    with chat_area.chat_message("user"):
         st.markdown(prompt)
 
-    with st.chat_message("assistant"):
+    with chat_area.chat_message("assistant"), telemetry.span("chat.turn", cacheable=cacheable) as turn_span:
+        st.session_state.last_turn_traces = [turn_span.trace_id]
         with st.spinner("선택하신 날짜의 날씨를 확인하고, 맞춤 스타일을 추천하는 중..."):
-            sido = st.session_state.user_info["sido"]
-            gungu = st.session_state.user_info["gungu"]
-            target_date = st.session_state.user_info["date"]
-            
-            coords_to_use = HIERARCHICAL_CITY_COORDS[sido].get(gungu if gungu != "(전체)" else "_default")
-            location_name = f"{sido} {gungu}" if gungu != "(전체)" else sido
+            user_info = st.session_state.user_info
+            coords_to_use, _ = resolve_location(user_info)
+
+            with telemetry.span("turn.weather") as span:
+                # 사이드바 변경 시 시작해 둔 조회가 있으면 그 결과를 기다리기만 합니다.
+                weather_info = None
+                lookup = st.session_state.get("weather_lookup")
+                if lookup is not None and not lookup.cancelled() and st.session_state.get("weather_lookup_key") == weather_lookup_key(coords_to_use, user_info["date"], kma_service_key):
+                    weather_info = lookup.result()
+                    span.set_attribute("speculative", True)
+                    st.session_state.last_turn_traces.append(st.session_state.get("weather_lookup_trace"))
+                if weather_info is None or is_weather_error(weather_info):
+                    weather_info = lookup_weather(user_info, kma_service_key)
             
-            weather_info = get_kma_weather_forecast(coords_to_use, kma_service_key, target_date)
-            
-            if "오류" in weather_info:
+            if is_weather_error(weather_info):
                 st.error(weather_info)
                 st.stop()
 
-            user_info_text = (
-                f"- 지역: {location_name}\n- 날짜: {target_date.strftime('%Y년 %m월 %d일')}\n"
-                f"- 성별: {st.session_state.user_info.get('gender')}\n- 나이: {st.session_state.user_info.get('age')}\n"
-                f"- TPO: {st.session_state.user_info.get('tpo')}\n- 선호 스타일: {st.session_state.user_info.get('style_preference')}\n"
-                f"- 퍼스널 컬러: {st.session_state.user_info.get('personal_color')}"
-            )
-            
-            system_prompt = f"""
-            당신은 사용자의 개인 정보, TPO, 패션 취향, 퍼스널 컬러와 **선택된 날짜의 날씨**를 종합 분석하여 패션을 추천하는 전문 AI 스타일리스트입니다.
-
-            **[답변 생성 규칙]**
-            1.  **답변 시작**: 가장 먼저, 어떤 사용자의 정보를 바탕으로 추천하는지 핵심만 요약해서 알려주세요.
-            2.  **날씨 정보**: '**{location_name}**의 **{target_date.strftime('%Y년 %m월 %d일')}** 날씨 정보'라는 제목으로 섹션을 만들고, 그 아래에 전달받은 날씨 데이터를 보여주세요. **날씨 정보는 하루 동안의 기온 변화(최저/최고 기온)를 기준으로 설명합니다.**
-            3.  **패션 추천**: '패션 추천' 섹션에서 날씨, TPO, 퍼스널 컬러 등을 모두 고려하여 1~2가지의 완성된 착장을 제안합니다.
-            4.  **스타일링 팁**: '스타일링 팁' 섹션에서 추가적인 팁을 제안합니다.
-            5.  **우산 안내 (조건부)**: 만약 날씨 정보에 '**비 또는 눈 소식이 있습니다.**' 라는 내용이 포함되어 있다면, '우산 챙기세요! ☔️' 라는 섹션을 추가하고 상냥하게 알려주세요.
-            6.  **말투**: 모든 답변은 친절하고 전문적인 말투를 사용해주세요.
-            """
-            
-            final_prompt = f"""
-            아래 날씨와 사용자 정보를 바탕으로, 요청에 맞는 패션을 추천해줘.
-            [선택한 날짜의 날씨 정보]
-            {weather_info}
-            [사용자 정보]
-            {user_info_text}
-            [사용자 요청]
-            {prompt}
-            """
-            
             try:
-                stream = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": final_prompt}],
-                    stream=True
-                )
-                response = st.write_stream(stream)
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                st.rerun()
+                # 추천 버튼의 고정 질문은 다음 예보 발표 시각까지 응답을 캐시합니다.
+                stream = stream_recommendation(openai_api_key, user_info, weather_info, prompt, cacheable=cacheable)
+                with telemetry.span("turn.render"):
+                    response = st.write_stream(stream)
+                chat_history.append("assistant", response)
 
             except Exception as e:
                 st.error(f"AI 응답 생성 중 오류가 발생했습니다: {e}")
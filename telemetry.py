@@ -0,0 +1,300 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# TELEMETRY=0 이면 span/카운터 호출이 아무 일도 하지 않습니다. (no-op 모드)
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY", "1") != "0"
+SERVICE_NAME = os.environ.get("TELEMETRY_SERVICE_NAME", "ai-fashion-stylist")
+# 히스토그램 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 초 단위가 아닌 히스토그램의 구간
+METRIC_BUCKETS = {
+    "llm_tokens_per_second": (5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0),
+    "prompt_tokens": (250.0, 500.0, 1000.0, 2000.0, 4000.0, 8000.0),
+    "prompt_cacheable_ratio": (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+}
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+# --- span ---
+class Span:
+    """with 블록 하나의 실행 구간. 같은 스레드(컨텍스트) 안에서 열린 span은 부모-자식으로 이어집니다."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "_telemetry", "_token")
+
+    def __init__(self, telemetry, name, attributes):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = self.end_ns = None
+        self._telemetry = telemetry
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self):
+        """초 단위 소요 시간. 아직 끝나지 않았으면 None."""
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self._telemetry._finish(self)
+        return False
+
+
+class _NoopSpan:
+    """no-op 모드에서 모든 span 대신 쓰는 빈 객체."""
+
+    __slots__ = ()
+    duration = None
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# --- 수집기 ---
+class Telemetry:
+    """단계별 span, 카운터, 히스토그램을 프로세스 안에 모아 두고 Prometheus/OTel 형식으로 내보냅니다.
+
+    - span(name): 소요 시간을 span_duration_seconds{span=name} 히스토그램에 더하고, 최근 span 목록에 남깁니다.
+    - count(name, **labels): name_total 카운터를 올립니다.
+    - observe(name, value, **labels): 임의의 값(TTFT, 토큰 속도 등)을 히스토그램에 더합니다.
+    """
+
+    def __init__(self, enabled=TELEMETRY_ENABLED, max_spans=1000, buckets=DEFAULT_BUCKETS, metric_buckets=METRIC_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.metric_buckets = dict(metric_buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    # --- 기록 ---
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def _finish(self, span):
+        with self._lock:
+            self._spans.append(span)
+            self._histogram("span_duration_seconds", (("span", span.name),)).observe(span.duration)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histogram(name, tuple(sorted(labels.items()))).observe(value)
+
+    def _histogram(self, name, labels):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = _Histogram(self.metric_buckets.get(name, self.buckets))
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._spans.clear()
+
+    # --- 조회 ---
+    def recent_spans(self, limit=None):
+        """끝난 span을 최근 것부터 반환합니다."""
+        with self._lock:
+            spans = list(self._spans)
+        spans.reverse()
+        return spans[:limit] if limit else spans
+
+    def last_trace(self, name=None):
+        """가장 최근에 끝난 최상위 span(name을 주면 그 이름의 span)과 그 하위 span들 (시작 순)."""
+        spans = self.recent_spans()
+        root = next((s for s in spans if s.parent_id is None and name in (None, s.name)), None)
+        if root is None:
+            return []
+        return self.trace(root.trace_id, spans)
+
+    def trace(self, trace_id, spans=None):
+        """trace_id에 속한 끝난 span들 (시작 순). 최근 span 목록에서 밀려났거나 trace_id가 None이면 빈 목록."""
+        if trace_id is None:
+            return []
+        spans = self.recent_spans() if spans is None else spans
+        return sorted((s for s in spans if s.trace_id == trace_id), key=lambda s: s.start_ns)
+
+    def snapshot(self):
+        """카운터와 히스토그램 요약(개수/합계/평균)을 dict로 반환합니다."""
+        with self._lock:
+            counters = {_series_name(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {
+                _series_name(name, labels): {"count": h.count, "sum": round(h.sum, 6),
+                                             "avg": round(h.sum / h.count, 6) if h.count else None}
+                for (name, labels), h in self._histograms.items()
+            }
+        return {"enabled": self.enabled, "counters": counters, "histograms": histograms}
+
+    # --- 내보내기 ---
+    def prometheus_text(self):
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()),
+                key=lambda x: x[0])
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(tuple(buckets) + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def otel_json(self, limit=None):
+        """최근 span을 OTLP/JSON(ExportTraceServiceRequest) 형태로 반환합니다."""
+        spans = [{
+            "traceId": s.trace_id, "spanId": s.span_id, "parentSpanId": s.parent_id or "",
+            "name": s.name, "kind": 1, "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.end_ns),
+            "attributes": [_otel_attribute(k, v) for k, v in s.attributes.items()],
+            "status": {"code": 2} if "error" in s.attributes else {},
+        } for s in reversed(self.recent_spans(limit))]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otel_attribute("service.name", SERVICE_NAME),
+                                        _otel_attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "telemetry"}, "spans": spans}],
+        }]}
+
+
+def _series_name(name, labels):
+    return name + _format_labels(labels)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _otel_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# 프로세스 전역 수집기 (모든 세션 공유)
+telemetry = Telemetry()
+
+
+# --- 스크레이프용 HTTP 엔드포인트 ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    telemetry = telemetry
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, content_type = self.telemetry.prometheus_text().encode(), "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/traces":
+            body, content_type = json.dumps(self.telemetry.otel_json()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """/metrics(Prometheus)와 /traces(OTLP JSON)를 내보내는 서버를 프로세스당 한 번만 띄웁니다."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _metrics_server
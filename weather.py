@@ -0,0 +1,620 @@
+import asyncio
+import contextvars
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import ijson
+
+from kma_client import KmaTemporaryError, KmaUnavailableError, kma_client
+from telemetry import telemetry
+
+# 로컬 대역 서버(bench/stub_servers.py) 등으로 바꿀 때는 KMA_FORECAST_URL 환경 변수를 지정합니다.
+KMA_FORECAST_URL = os.environ.get(
+    "KMA_FORECAST_URL", "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getVilageFcst")
+
+# 기상청 단기예보 발표 시각 (02, 05, ..., 23시) - 3시간 간격
+PUBLICATION_HOURS = [2, 5, 8, 11, 14, 17, 20, 23]
+PUBLICATION_INTERVAL = timedelta(hours=3)
+# 발표 시각 이후 API에 실제로 올라오기까지 약 10분이 걸립니다.
+POSTING_DELAY = timedelta(minutes=10)
+
+
+class WeatherError(Exception):
+    """사용자에게 그대로 보여줄 수 있는 날씨 조회 오류."""
+
+
+# --- 발표 시각 계산 ---
+def get_base_datetime(now=None):
+    """현재 시각 기준으로 API에서 조회 가능한 가장 최근의 단기예보 발표 시각을 반환합니다."""
+    now = (now or datetime.now()) - POSTING_DELAY
+    valid_times = [t for t in PUBLICATION_HOURS if t <= now.hour]
+    if not valid_times:
+        base_day = now - timedelta(days=1)
+        base_time_hour = 23
+    else:
+        base_day = now
+        base_time_hour = max(valid_times)
+    return base_day.replace(hour=base_time_hour, minute=0, second=0, microsecond=0)
+
+
+def get_next_publication(base_dt):
+    """다음 예보가 API에 올라오는 시각 (= 현재 예보의 캐시 만료 시각)."""
+    return base_dt + PUBLICATION_INTERVAL + POSTING_DELAY
+
+
+# --- 프로세스 전역 예보 캐시 ---
+class ForecastCache:
+    """(nx, ny, base_date, base_time) 키로 예보 요약을 공유하는 LRU 캐시.
+
+    모든 세션이 같은 인스턴스를 사용하며, 항목은 다음 예보 발표 시각에 만료됩니다.
+    같은 키에 대한 동시 요청은 하나의 upstream 요청으로 합쳐집니다.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        self._last_good = OrderedDict()  # (nx, ny) -> 가장 최근에 받은 정상 예보 (만료와 무관)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._put_locked(key, value, expires_at)
+
+    def _put_locked(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+        cell = key[:2]
+        self._last_good[cell] = value
+        self._last_good.move_to_end(cell)
+        while len(self._last_good) > self.maxsize:
+            self._last_good.popitem(last=False)
+
+    def get_last_good(self, nx, ny):
+        """발표 주기와 관계없이 해당 격자에서 마지막으로 받은 정상 예보. (장애 시 대체용)"""
+        with self._lock:
+            return self._last_good.get((nx, ny))
+
+    def get_or_fetch(self, key, expires_at, fetch, now=None):
+        """캐시에 있으면 바로 반환하고, 없으면 fetch()를 한 번만 호출해 채웁니다."""
+        value, future, leader = self._claim(key, now)
+        if future is None:
+            return value
+        if not leader:
+            # 이미 같은 격자/발표 시각을 요청 중인 스레드가 있으면 그 결과를 기다립니다.
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value, expires_at)
+        return value
+
+    async def get_or_fetch_async(self, key, expires_at, fetch, now=None):
+        """get_or_fetch의 비동기 버전. fetch는 코루틴 함수입니다.
+
+        진행 중인 요청 목록을 동기 버전과 공유하므로, 스레드와 코루틴의 요청도 하나로 합쳐집니다.
+        """
+        value, future, leader = self._claim(key, now)
+        if future is None:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            value = await fetch()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value, expires_at)
+        return value
+
+    def _claim(self, key, now):
+        """적중이면 (값, None, False), 아니면 (None, 진행 중인 Future, 직접 받아야 하는지)를 반환합니다."""
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                telemetry.count("forecast_cache_lookups", result="hit")
+                return entry[1], None, False
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        telemetry.count("forecast_cache_lookups", result="miss" if leader else "coalesced")
+        return None, future, leader
+
+    def _settle(self, key, future, value=None, expires_at=None, error=None):
+        with self._lock:
+            # 오류는 캐시하지 않고, 성공한 결과만 저장합니다.
+            if error is None:
+                self._put_locked(key, value, expires_at)
+            del self._inflight[key]
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._last_good.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+forecast_cache = ForecastCache()
+
+
+# --- 예보 요약 (날짜별, 열 단위 저장) ---
+SKY_CODES = {"1": "맑음", "3": "구름 많음", "4": "흐림"}
+
+
+class ForecastSummary:
+    """한 번의 getVilageFcst 응답에 포함된 모든 날짜의 요약.
+
+    날짜별 dict 목록 대신 같은 길이의 열(list)로 저장하고, 날짜 → 행 번호 인덱스로 조회합니다.
+    """
+
+    __slots__ = ("dates", "tmn", "tmx", "tmp_min", "tmp_max", "sky", "precipitation", "_index")
+
+    def __init__(self):
+        self.dates = []
+        self.tmn = []  # TMN 원본 값 (없으면 None)
+        self.tmx = []  # TMX 원본 값 (없으면 None)
+        self.tmp_min = []  # 시간대별 기온(TMP) 최솟값 (없으면 None)
+        self.tmp_max = []
+        self.sky = []  # 가장 많이 나온 SKY 코드
+        self.precipitation = []  # PTY 또는 POP 기준 강수 여부
+        self._index = {}
+
+    def __contains__(self, date_str):
+        return date_str in self._index
+
+    def __len__(self):
+        return len(self.dates)
+
+    def format(self, date_str):
+        """해당 날짜의 날씨 요약 문구를 반환합니다. 예보가 없으면 None."""
+        row = self._index.get(date_str)
+        if row is None:
+            return None
+
+        tmn, tmx = self.tmn[row], self.tmx[row]
+        # [수정됨] 오늘 날짜의 최저/최고 기온이 없는 경우, 시간대별 기온(TMP)으로 대체
+        if (tmn is None or tmx is None) and self.tmp_min[row] is not None:
+            tmn, tmx = self.tmp_min[row], self.tmp_max[row]
+
+        main_sky = SKY_CODES.get(self.sky[row], "정보 없음")
+        has_precipitation = self.precipitation[row]
+        return (
+            f"**기온**: 최저 {tmn or '-'}°C / 최고 {tmx or '-'}°C\n"
+            f"**날씨**: {main_sky}\n"
+            f"**강수 여부**: {'비 또는 눈 소식이 있습니다.' if has_precipitation else '비/눈 소식은 없습니다.'}"
+        )
+
+
+class ForecastAggregator:
+    """예보 항목을 한 번씩만 훑으면서 날짜별 요약을 누적합니다."""
+
+    def __init__(self):
+        self.summary = ForecastSummary()
+        self._sky_counts = []  # 행별 {SKY 코드: 횟수}
+
+    def _row(self, date_str):
+        s = self.summary
+        row = s._index.get(date_str)
+        if row is None:
+            row = s._index[date_str] = len(s.dates)
+            s.dates.append(date_str)
+            s.tmn.append(None)
+            s.tmx.append(None)
+            s.tmp_min.append(None)
+            s.tmp_max.append(None)
+            s.sky.append("1")
+            s.precipitation.append(False)
+            self._sky_counts.append({})
+        return row
+
+    def add(self, item):
+        date_str = item.get("fcstDate")
+        category = item.get("category")
+        if not date_str or not category:
+            return
+        value = item.get("fcstValue")
+        s = self.summary
+        row = self._row(date_str)
+
+        if category == "TMN":
+            if s.tmn[row] is None: s.tmn[row] = value
+        elif category == "TMX":
+            if s.tmx[row] is None: s.tmx[row] = value
+        elif category == "TMP":
+            t = int(value)
+            if s.tmp_min[row] is None or t < s.tmp_min[row]: s.tmp_min[row] = t
+            if s.tmp_max[row] is None or t > s.tmp_max[row]: s.tmp_max[row] = t
+        elif category == "SKY":
+            counts = self._sky_counts[row]
+            counts[value] = counts.get(value, 0) + 1
+        elif category == "PTY":
+            if value != "0": s.precipitation[row] = True
+        elif category == "POP":
+            if value.isdigit() and int(value) > 40: s.precipitation[row] = True
+
+    def add_all(self, items):
+        for item in items:
+            self.add(item)
+        return self
+
+    def finish(self):
+        s = self.summary
+        for row, counts in enumerate(self._sky_counts):
+            if counts:
+                s.sky[row] = max(counts, key=counts.get)
+        return s
+
+
+def summarize_forecast(items):
+    """예보 항목 전체를 한 번에 날짜별 요약으로 변환합니다."""
+    return ForecastAggregator().add_all(items).finish()
+
+
+# --- 기상청 API 호출 ---
+PAGE_SIZE = 1000
+MAX_PAGE_WORKERS = 4
+_ITEM_PREFIX = "response.body.items.item.item"
+# 본문 결과 코드 중 잠시 뒤 다시 요청하면 되는 것 (HTTP 상태는 200으로 옵니다)
+# 01 APPLICATION_ERROR, 02 DB_ERROR, 04 HTTP_ERROR, 05 SERVICETIME_OUT, 22 호출 한도 초과
+TEMPORARY_RESULT_CODES = {"01", "02", "04", "05", "22"}
+# data.go.kr 게이트웨이는 dataType=JSON이어도 오류를 XML 페이지로 돌려줄 때가 있습니다.
+_XML_CODE = re.compile(rb"<(?:resultCode|returnReasonCode)>\s*(\d+)\s*<")
+_XML_MESSAGE = re.compile(rb"<(?:resultMsg|returnAuthMsg)>\s*([^<]*?)\s*<")
+
+# 2페이지 이후는 동시에 받아옵니다. (모든 세션이 공유하는 작은 풀)
+_page_executor = ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS, thread_name_prefix="kma-page")
+
+
+def _page_params(nx, ny, base_date, base_time, service_key, page_no):
+    return {"serviceKey": service_key, "pageNo": str(page_no), "numOfRows": str(PAGE_SIZE),
+            "dataType": "JSON", "base_date": base_date, "base_time": base_time,
+            "nx": str(nx), "ny": str(ny)}
+
+
+class _PageParser:
+    """ijson 이벤트를 받아 예보 항목을 하나씩 만들어 on_item(item)으로 넘깁니다.
+
+    본문 도중 끊겨 같은 페이지를 다시 받을 때는, 앞선 시도에서 이미 넘긴 앞쪽 skip개 항목을 건너뜁니다.
+    """
+
+    def __init__(self, on_item, skip=0):
+        self.on_item = on_item
+        self.skip = skip
+        self.items = 0  # 이번 시도에서 읽은 항목 수
+        self.header = {}
+        self.total_count = None
+        self._item = None
+        self._key = None
+
+    @property
+    def delivered(self):
+        """지금까지(앞선 시도 포함) on_item으로 넘긴 항목 수."""
+        return max(self.skip, self.items)
+
+    def feed(self, prefix, event, value):
+        if self._item is not None:
+            if prefix == _ITEM_PREFIX:
+                if event == "map_key":
+                    self._key = value
+                elif event == "end_map":
+                    self.items += 1
+                    if self.items > self.skip:
+                        self.on_item(self._item)
+                    self._item = None
+            else:
+                self._item[self._key] = value
+        elif prefix == _ITEM_PREFIX and event == "start_map":
+            self._item = {}
+        elif prefix.startswith("response.header.") and event != "map_key":
+            self.header[prefix.rsplit(".", 1)[1]] = value
+        elif prefix == "response.header" and event == "end_map":
+            # 헤더는 본문보다 먼저 오므로, 오류 응답이면 본문을 읽기 전에 중단합니다.
+            self.check_header()
+        elif prefix == "response.body.totalCount":
+            self.total_count = int(value)
+
+    def check_header(self):
+        check_result_code(self.header.get("resultCode"), self.header.get("resultMsg", "알 수 없는 오류"))
+
+
+def check_result_code(code, message):
+    """응답 본문의 결과 코드를 확인합니다. 일시적인 오류는 KmaTemporaryError(재시도), 나머지는 WeatherError."""
+    if code == "00":
+        return
+    if code in TEMPORARY_RESULT_CODES:
+        raise KmaTemporaryError(code, message)
+    raise WeatherError(f"기상청 API 오류: {message}")
+
+
+def _is_markup(head):
+    return head.lstrip().startswith(b"<")
+
+
+def _raise_for_markup(body):
+    """JSON 대신 온 XML/HTML 오류 페이지를 결과 코드에 맞는 예외로 바꿉니다."""
+    code, message = _XML_CODE.search(body), _XML_MESSAGE.search(body)
+    message = message.group(1).decode("utf-8", "replace") if message else "알 수 없는 오류"
+    if code is None:
+        # 결과 코드가 없는 페이지는 앞단 프록시의 오류 화면이므로 일시적인 오류로 봅니다.
+        raise KmaTemporaryError("markup", "JSON이 아닌 응답")
+    check_result_code(code.group(1).decode().zfill(2), message)
+    raise WeatherError(f"기상청 API 오류: JSON이 아닌 응답 ({message})")
+
+
+class _ByteReader:
+    """res.raw를 감싸 앞부분을 소비하지 않고 미리 볼 수 있게 합니다. (오류 페이지 판별용)"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._buffer = b""
+
+    def peek(self, size):
+        if len(self._buffer) < size:
+            self._buffer += self._raw.read(size - len(self._buffer))
+        return self._buffer
+
+    def read(self, size=-1):
+        if not self._buffer:
+            return self._raw.read(size)
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def stream_forecast_page(nx, ny, base_date, base_time, service_key, page_no, on_item, client=None):
+    """한 페이지를 스트리밍으로 파싱하면서 항목마다 on_item(item)을 호출합니다.
+
+    응답 전체를 메모리에 올리지 않고 ijson 이벤트로 항목을 하나씩 만들며, 응답의 totalCount를 반환합니다.
+    본문을 읽다가 끊기면 클라이언트가 페이지를 다시 요청하고, 이미 넘긴 항목은 다시 넘기지 않습니다.
+    """
+    client = client or kma_client
+    params = _page_params(nx, ny, base_date, base_time, service_key, page_no)
+    parser = _PageParser(on_item)
+
+    def consume(res):
+        nonlocal parser
+        parser = _PageParser(on_item, skip=parser.delivered)
+        # 본문 수신과 파싱/집계가 번갈아 일어나므로 한 구간으로 잽니다.
+        with telemetry.span("weather.parse"):
+            res.raw.decode_content = True
+            reader = _ByteReader(res.raw)
+            if _is_markup(reader.peek(64)):
+                _raise_for_markup(reader.read() + res.raw.read())
+            for prefix, event, value in ijson.parse(reader):
+                parser.feed(prefix, event, value)
+            # 결과 코드 확인도 재시도 범위 안에서 합니다.
+            parser.check_header()
+
+    with telemetry.span("weather.page", page_no=page_no):
+        client.get(KMA_FORECAST_URL, params, consume=consume)
+    return parser.total_count
+
+
+def _page_count(total_count):
+    return -(-(total_count or 0) // PAGE_SIZE)
+
+
+def fetch_forecast_summary(nx, ny, base_date, base_time, service_key, client=None):
+    """예보 전체 페이지를 내려받으며 응답에 포함된 모든 날짜의 요약을 만듭니다."""
+    aggregator = ForecastAggregator()
+    lock = threading.Lock()
+    seen = [0]
+
+    def on_item(item):
+        with lock:
+            aggregator.add(item)
+            seen[0] += 1
+
+    with telemetry.span("weather.fetch", nx=nx, ny=ny) as span:
+        # 1페이지에서 totalCount를 확인한 뒤, 남은 페이지는 동시에 요청합니다.
+        total_count = stream_forecast_page(nx, ny, base_date, base_time, service_key, 1, on_item, client)
+        if not seen[0]:
+            raise WeatherError("오류: 날씨 정보를 찾을 수 없습니다.")
+
+        # 다른 스레드의 페이지 span도 이 span 아래에 이어지도록 컨텍스트를 복사해 넘깁니다.
+        futures = [
+            _page_executor.submit(contextvars.copy_context().run, stream_forecast_page,
+                                  nx, ny, base_date, base_time, service_key, page_no, on_item, client)
+            for page_no in range(2, _page_count(total_count) + 1)
+        ]
+        for future in futures:
+            future.result()
+
+        span.set_attribute("pages", len(futures) + 1)
+        span.set_attribute("items", seen[0])
+        return aggregator.finish()
+
+
+class _AsyncByteReader:
+    """httpx 스트리밍 응답을 ijson.parse_async가 읽을 수 있는 read() 인터페이스로 감쌉니다."""
+
+    def __init__(self, response):
+        self._chunks = response.aiter_bytes()
+        self._buffer = b""
+
+    async def peek(self):
+        """다음에 read()로 돌려줄 조각을 소비하지 않고 미리 봅니다. (본문 끝이면 b"")"""
+        while not self._buffer:
+            try:
+                self._buffer = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b""
+        return self._buffer
+
+    async def read_all(self):
+        chunks = [await self.read()]
+        while chunks[-1]:
+            chunks.append(await self.read())
+        return b"".join(chunks)
+
+    async def read(self, size=-1):
+        # ijson은 요청한 크기 이하의 바이트만 돌려받기를 기대하므로, 남는 부분은 버퍼에 둡니다.
+        if not await self.peek():
+            return b""
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+async def stream_forecast_page_async(client, nx, ny, base_date, base_time, service_key, page_no, on_item):
+    """stream_forecast_page의 비동기 버전."""
+    params = _page_params(nx, ny, base_date, base_time, service_key, page_no)
+    parser = _PageParser(on_item)
+
+    async def consume(res):
+        nonlocal parser
+        parser = _PageParser(on_item, skip=parser.delivered)
+        reader = _AsyncByteReader(res)
+        if _is_markup(await reader.peek()):
+            _raise_for_markup(await reader.read_all())
+        async for prefix, event, value in ijson.parse_async(reader):
+            parser.feed(prefix, event, value)
+        parser.check_header()
+
+    await client.get(KMA_FORECAST_URL, params, consume)
+    return parser.total_count
+
+
+async def fetch_forecast_summary_async(client, nx, ny, base_date, base_time, service_key):
+    """fetch_forecast_summary의 비동기 버전. 남은 페이지는 asyncio.gather로 동시에 받습니다."""
+    aggregator = ForecastAggregator()
+    on_item = aggregator.add  # 단일 이벤트 루프 안에서만 호출되므로 잠금이 필요 없습니다.
+
+    total_count = await stream_forecast_page_async(client, nx, ny, base_date, base_time, service_key, 1, on_item)
+    if not len(aggregator.summary):
+        raise WeatherError("오류: 날씨 정보를 찾을 수 없습니다.")
+
+    await asyncio.gather(*(
+        stream_forecast_page_async(client, nx, ny, base_date, base_time, service_key, page_no, on_item)
+        for page_no in range(2, _page_count(total_count) + 1)
+    ))
+    return aggregator.finish()
+
+
+def forecast_key(nx, ny, base_dt):
+    """예보 캐시 키 (nx, ny, base_date, base_time)."""
+    return (nx, ny, base_dt.strftime("%Y%m%d"), base_dt.strftime("%H%M"))
+
+
+def get_forecast_summary(nx, ny, service_key, now=None, cache=forecast_cache, allow_stale=True, client=None):
+    """현재 발표 주기의 날짜별 예보 요약을 캐시를 거쳐 가져옵니다. client를 주면 그 KmaClient로 요청합니다.
+
+    기상청 서버 장애(KmaUnavailableError) 시 allow_stale이면 마지막으로 받은 정상 예보를 대신 반환합니다.
+    """
+    base_dt = get_base_datetime(now)
+    key = forecast_key(nx, ny, base_dt)
+    _, _, base_date, base_time = key
+    try:
+        return cache.get_or_fetch(
+            key, get_next_publication(base_dt),
+            lambda: fetch_forecast_summary(nx, ny, base_date, base_time, service_key, client),
+            now=now,
+        )
+    except KmaUnavailableError:
+        stale = cache.get_last_good(nx, ny) if allow_stale else None
+        if stale is None:
+            raise
+        telemetry.count("forecast_stale_served")
+        return stale
+
+
+async def get_forecast_summary_async(client, nx, ny, service_key, now=None, cache=forecast_cache, allow_stale=True):
+    """get_forecast_summary의 비동기 버전. 같은 프로세스 전역 캐시와 진행 중인 요청 목록을 사용합니다."""
+    base_dt = get_base_datetime(now)
+    key = forecast_key(nx, ny, base_dt)
+    _, _, base_date, base_time = key
+    try:
+        return await cache.get_or_fetch_async(
+            key, get_next_publication(base_dt),
+            lambda: fetch_forecast_summary_async(client, nx, ny, base_date, base_time, service_key),
+            now=now,
+        )
+    except KmaUnavailableError:
+        stale = cache.get_last_good(nx, ny) if allow_stale else None
+        if stale is None:
+            raise
+        telemetry.count("forecast_stale_served")
+        return stale
+
+
+# --- [수정됨] 날씨 API 함수: 오늘 날씨 처리 로직 개선 ---
+def get_kma_weather_forecast(coords, service_key, target_date):
+    """기상청 단기예보 API로 특정 날짜의 날씨 정보를 가져옵니다."""
+    if not service_key:
+        return "오류: 기상청 서비스 키가 입력되지 않았습니다."
+
+    nx, ny = coords["nx"], coords["ny"]
+    with telemetry.span("weather.lookup", nx=nx, ny=ny) as span:
+        weather_info = _forecast_text(nx, ny, service_key, target_date)
+        if "오류" in weather_info:
+            span.set_attribute("error", "weather")
+            telemetry.count("weather_lookup_errors")
+        return weather_info
+
+
+def _forecast_text(nx, ny, service_key, target_date):
+    try:
+        # 응답 하나로 모든 날짜가 요약되어 있으므로, 날짜를 바꿔도 재요청/재파싱이 없습니다.
+        summary = get_forecast_summary(nx, ny, service_key)
+        weather_info = summary.format(target_date.strftime("%Y%m%d"))
+        if weather_info is None:
+            return f"오류: {target_date.strftime('%Y년 %m월 %d일')}의 예보가 아직 없습니다."
+        return weather_info
+
+    except WeatherError as e:
+        return str(e)
+    except KmaUnavailableError:
+        return "오류: 기상청 서버가 응답하지 않습니다. 잠시 후 다시 시도해주세요."
+    except Exception as e:
+        return f"오류: 날씨 정보 조회 중 알 수 없는 문제가 발생했습니다. ({e})"
+
+
+# --- 선제 조회 ---
+# 사이드바에서 지역/날짜가 바뀌는 즉시 백그라운드로 조회를 시작해, 채팅 요청 시에는 결과만 기다리게 합니다.
+_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kma-lookup")
+
+
+def submit_weather_forecast(coords, service_key, target_date):
+    """get_kma_weather_forecast를 백그라운드에서 실행하고 Future를 반환합니다."""
+    # 호출한 쪽의 span 아래에 기록되도록 컨텍스트를 복사해 넘깁니다.
+    return _lookup_executor.submit(contextvars.copy_context().run, get_kma_weather_forecast, coords, service_key, target_date)